@@ -1,19 +1,32 @@
 import os
-import json
+import uuid
 import streamlit as st
-import openai
-import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
+from concurrent.futures import ThreadPoolExecutor
 from modules.reasoning_tracker import ReasoningTracker
 from modules.html_exporter import generate_html_report
 from modules.usage_metrics import UsageMetrics
-
-# ---- Helper para contar nodos en árbol ----
-def count_nodes(tree):
-    if not tree or not isinstance(tree, dict):
-        return 0
-    return 1 + sum([count_nodes(child) for child in tree.get("children", [])])
+from modules.columnar_export import ColumnarExporter, rows_since, has_pyarrow, to_parquet_bytes, to_csv_bytes
+from modules.eee_evaluator import calcular_eee
+from modules.fake_llm import FakeLLM
+from modules.openai_client import get_openai
+from modules.tracing import Tracer, activate, span, current_span, instrument_chat
+from modules.token_budget import TokenBudget, BudgetExceeded, CallDeferred, budgeted_chat, LOW
+from modules.multiperspective import (
+    PERSPECTIVES,
+    count_nodes,
+    generate_tree,
+    prefetch_trees,
+    sugerir_reformulaciones,
+    generar_respuestas_multiperspectiva,
+    TreeGraph,
+)
+from modules.inquiry_engine import expand_node
+from modules.contextual_generator import generate_shared_responses
+from modules.dedup import merge_trees
+from modules.live_sync import FeedbackChannel, LiveSync, room_for, new_remote, merged_states, merged_feedback
+from modules.session_memory import SessionMemoryManager
+from modules.step_index import StepIndex, page_count, paginate, step_row
+from modules.speculative import SpeculativePrefetcher
 
 # ---- 0. Configuración de página ----
 st.set_page_config(
@@ -28,14 +41,52 @@ mode = st.sidebar.selectbox(
     "Perfil del usuario",
     ["Asistido (básico)", "Guiado (intermedio)", "Exploratorio (avanzado)"]
 )
+speculate = st.sidebar.checkbox(
+    "Precargar respuestas de las subpreguntas probables",
+    value=False,
+    help="Genera en segundo plano las respuestas multiperspectiva de las primeras subpreguntas del árbol."
+)
+perf_enabled = st.sidebar.checkbox("Medir rendimiento (panel «Rendimiento»)", value=False)
+sync_code = st.sidebar.text_input(
+    "Código de clase para feedback en vivo",
+    value=os.getenv("CODIGO_SYNC_SALA", ""),
+    help="Solo comparten feedback y estados las sesiones con el mismo código y la misma pregunta raíz. Vacío: no se comparte nada."
+).strip()
 st.sidebar.markdown("---")
 st.sidebar.info("Grupo de Investigación en IA.")
 
+# ---- Memoria de sesión: los datos pesados van en un slot que puede volcarse a disco ----
+@st.cache_resource
+def get_memory_manager():
+    # Los grafos DOT, el grafo compartido y el índice de pasos se reconstruyen: no se guardan al volcar
+    return SessionMemoryManager.from_env(transient=("graphs", "shared_graph", "step_index"))
+
+memory = get_memory_manager()
+
 if st.sidebar.button("🔄 Nuevo razonamiento / Reset"):
+    memory.forget(st.session_state.get("memory_slot"))
     for k in list(st.session_state.keys()):
         del st.session_state[k]
     st.rerun()
 
+# ---- Trazas de rendimiento por etapa (sin coste si están desactivadas) ----
+if "tracer" not in st.session_state:
+    st.session_state["tracer"] = Tracer()
+tracer = st.session_state["tracer"]
+tracer.enabled = perf_enabled
+tracer.new_run()
+activate(tracer)
+
+if "memory_slot" not in st.session_state:
+    st.session_state["memory_slot"] = uuid.uuid4().hex
+# Si la sesión estaba volcada a disco se rehidrata en el primer acceso
+state = memory.checkin(st.session_state["memory_slot"])
+
+def stop():
+    """st.stop() que antes cierra la ejecución en el gestor (si no, el slot seguiría marcado como activo)."""
+    memory.checkout(state)
+    st.stop()
+
 # ---- 2. Título principal ----
 st.title("🧠 Código Deliberativo para Pensamiento Crítico")
 st.markdown(
@@ -69,17 +120,29 @@ else:
     )
 if not root_question:
     st.warning("🛈 Necesitamos una pregunta raíz para continuar.")
-    st.stop()
+    stop()
 
 # ---- RESET AUTOMÁTICO AL CAMBIAR DE PREGUNTA ----
 if (
     "last_root_question" not in st.session_state
     or st.session_state["last_root_question"] != root_question
+    or "tracker" not in state
 ):
-    st.session_state["tracker"] = ReasoningTracker(root_question)
+    state["tracker"] = ReasoningTracker(root_question)
     st.session_state["last_root_question"] = root_question
+    st.session_state["session_id"] = uuid.uuid4().hex[:12]
     st.session_state.pop("node_selected", None)
-    st.session_state.pop("respuestas_multiperspectiva", None)
+    state.pop("respuestas_multiperspectiva", None)
+    state.pop("trees", None)
+    state.pop("graphs", None)
+    state.pop("shared_graph", None)
+    state.pop("canonical_pins", None)
+    state.pop("prefetched", None)
+    if "prefetcher" in st.session_state:
+        st.session_state.pop("prefetcher").cancel()
+    for future in st.session_state.pop("tree_futures", {}).values():
+        future.cancel()
+    state.pop("focus_suggestions", None)
 
 # ---- INICIALIZACIÓN USAGE METRICS ----
 if "usage" not in st.session_state:
@@ -91,109 +154,234 @@ if (
     st.session_state["usage"].new_session(root_question)
 
 # ---- 4. Preparación OpenAI ----
-openai.api_key = os.getenv("OPENAI_API_KEY")
-def chat(messages, max_tokens=500):
-    return openai.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=messages,
-        temperature=0.7,
-        max_tokens=max_tokens,
-    )
-
-# ---- 5. Definir marcos multiperspectiva ----
-PERSPECTIVES = {
-    "Ética": "Desde una perspectiva ética (deontología, utilitarismo, ética del cuidado)...",
-    "Histórico-Social": "Desde una perspectiva histórica o sociopolítica relevante...",
-    "Epistemológica": "Desde una perspectiva crítica epistemológica o filosófica..."
-}
-
-# ---- 6. Generación de árboles multiperspectiva ----
-def generate_trees(root_question, chat_fn):
-    trees = {}
-    for marco, intro in PERSPECTIVES.items():
-        prompt = (
-            f"{intro}\n"
-            f"Pregunta raíz: “{root_question}”\n"
-            "1. Identifica 3–5 subpreguntas necesarias para el análisis crítico.\n"
-            "2. Organízalas en estructura jerárquica.\n"
-            "Devuelve solo JSON: {{ 'node': '...', 'children': [ ... ] }}"
+if os.getenv("CODIGO_LLM_BACKEND") == "fake":
+    # Backend determinista sin red (ver modules/fake_llm.py y benchmarks/)
+    chat_backend = FakeLLM.from_env()
+else:
+    # Import diferido (modules/openai_client.py): el backend falso no carga el SDK de OpenAI
+    def chat_backend(messages, max_tokens=500):
+        return get_openai().chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=max_tokens,
         )
-        resp = chat_fn([{"role": "system", "content": prompt}], max_tokens=600)
+traced_chat = instrument_chat(chat_backend, retries=int(os.getenv("CODIGO_LLM_RETRIES", "0")))
+
+# ---- Presupuesto de tokens por sesión/día y planificación por prioridad ----
+if "token_budget" not in st.session_state:
+    st.session_state["token_budget"] = TokenBudget.from_env()
+budget = st.session_state["token_budget"]
+chat = budgeted_chat(traced_chat, budget)
+chat_low = budgeted_chat(traced_chat, budget, priority=LOW)
+REFORMULATION_CONTEXT_TOKENS = 800
+
+# ---- 5-6. Generación perezosa de árboles multiperspectiva (marcos en modules/multiperspective.py) ----
+@st.cache_resource
+def get_prefetch_executor():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="codigo-prefetch")
+
+def get_tree(marco):
+    """Devuelve el árbol del marco: ya generado, precargado en segundo plano o generado ahora."""
+    trees = state.setdefault("trees", {})
+    if marco in trees:
+        current_span().add(cache_hits=1)
+        return trees[marco]
+    tree = None
+    future = st.session_state.setdefault("tree_futures", {}).pop(marco, None)
+    # Si la precarga sigue en cola (detrás de las de otras sesiones) no se espera: se cancela
+    # y se genera ahora con prioridad alta. Solo se espera a la que ya está en curso.
+    if future is not None and not future.done() and not future.running():
+        future.cancel()
+    if future is not None and not future.cancelled():
         try:
-            trees[marco] = json.loads(resp.choices[0].message.content)
+            tree = future.result()
+            current_span().add(cache_hits=1)
         except Exception:
-            trees[marco] = {"node": "Error al generar", "children": []}
-    return trees
+            # Precarga aplazada por presupuesto o fallida: se genera ahora con prioridad alta
+            tree = None
+    if tree is None:
+        try:
+            tree = generate_tree(root_question, marco, chat)
+        except BudgetExceeded as e:
+            st.error(f"⛔ {e}")
+            stop()
+    trees[marco] = tree
+    st.session_state["usage"].add_nodes(count_nodes(tree))
+    return tree
+
+def collect_prefetched_trees():
+    """Pasa a state["trees"] los árboles cuya precarga ya terminó bien (sin esperar a que se visiten)."""
+    trees = state.setdefault("trees", {})
+    futures = st.session_state.setdefault("tree_futures", {})
+    for marco, future in list(futures.items()):
+        if not future.done() or future.cancelled() or future.exception() is not None:
+            # En curso, o fallida: get_tree() la generará con prioridad alta al visitarla
+            continue
+        tree = futures.pop(marco).result()
+        if tree and marco not in trees:
+            trees[marco] = tree
+            st.session_state["usage"].add_nodes(count_nodes(tree))
+
+def prefetch_remaining_trees():
+    """Precarga con prioridad baja los marcos que aún no se han generado ni solicitado."""
+    collect_prefetched_trees()
+    futures = st.session_state.setdefault("tree_futures", {})
+    pending = [m for m in PERSPECTIVES if m not in state["trees"] and m not in futures]
+    if pending:
+        futures.update(prefetch_trees(root_question, pending, chat_low, get_prefetch_executor()))
+
+# ---- Subpreguntas comunes entre marcos (modules/dedup.py) ----
+def get_shared_graph():
+    """Grafo de nodos canónicos de los árboles ya generados; se rehace si cambia el conjunto."""
+    collect_prefetched_trees()
+    trees = state["trees"]
+    key = tuple(sorted(trees))
+    cached = state.get("shared_graph")
+    if cached is None or cached[0] != key:
+        with span("app.dedup"):
+            cached = (key, merge_trees(trees, pinned=state.get("canonical_pins")))
+        state["shared_graph"] = cached
+    return cached[1]
+
+def canonical(label):
+    """Etiqueta canónica: estados, feedback y respuestas no se fragmentan entre duplicados."""
+    pinned = state.get("canonical_pins", {}).get(label)
+    return pinned if pinned is not None else get_shared_graph().canonical_label(label)
+
+def pin_canonical(label):
+    """
+    Canónica de `label` fijada para siempre en la sesión: se llama al guardar estado,
+    feedback o respuestas bajo ella, para que un injerto o un árbol precargado
+    después no elija otra y deje esos datos huérfanos.
+    """
+    label = canonical(label)
+    pins = state.setdefault("canonical_pins", {})
+    for member in get_shared_graph().group(label):
+        pins.setdefault(member, label)
+    return label
+
+# ---- Feedback y estados compartidos en una sala de clase (modules/live_sync.py) ----
+# Opcional: solo con código de clase. Lo recibido se guarda en LiveSync, no en el tracker.
+SYNC_DB = os.getenv("CODIGO_SYNC_DB", "live_sync.db")
+SYNC_INTERVAL = float(os.getenv("CODIGO_SYNC_INTERVAL", "5"))
+SYNC_HISTORY = float(os.getenv("CODIGO_SYNC_HISTORIA_H", "2")) * 3600
+SYNC_RETENTION = float(os.getenv("CODIGO_SYNC_RETENCION_H", "24")) * 3600
+
+@st.cache_resource
+def get_feedback_channel(path):
+    return FeedbackChannel(path, retention_seconds=SYNC_RETENTION)
+
+sync = None
+room = room_for(sync_code, root_question)
+if SYNC_DB and room:
+    sync = st.session_state.get("live_sync")
+    if sync is None or sync.session_id != st.session_state["session_id"] or sync.room != room:
+        sync = LiveSync(get_feedback_channel(SYNC_DB), room, st.session_state["session_id"],
+                        history_seconds=SYNC_HISTORY)
+        st.session_state["live_sync"] = sync
+        # Lo recibido vive en el slot: cuenta en la huella y se vuelca con el resto
+        state["live_remote"] = new_remote()
+    with span("app.live_sync"):
+        sync.apply(state.setdefault("live_remote", new_remote()), resolve=pin_canonical)
+else:
+    st.session_state.pop("live_sync", None)
 
-with st.spinner("Generando árboles multiperspectiva…"):
-    trees = generate_trees(root_question, chat)
-    st.session_state["usage"].add_nodes(sum([count_nodes(tree) for tree in trees.values()]))
+def shared_node_states():
+    """Estados del tracker más los recibidos de la sala (solo para mostrar)."""
+    local = state["tracker"].log.get("node_states", {})
+    return merged_states(local, state["live_remote"]) if sync else local
 
 # ---- SUGERENCIAS DE REFORMULACIÓN DE FOCO (antes de visualización) ----
-def sugerir_reformulaciones(root_question, tree, perfil, chat_fn):
-    prompt = (
-        "Eres un Motor de Diálogo Adaptativo.\n"
-        f"Árbol (JSON): {json.dumps(tree, ensure_ascii=False)}\n"
-        f"Perfil: {perfil}\n\n"
-        "Si hay ambigüedad o margen de mejora, sugiere hasta 2 reformulaciones de la pregunta raíz.\n"
-        "Responde solo con JSON de lista:\n"
-        '[{"original":"…","suggestions":["…","…"]},…]'
-    )
-    r = chat_fn([{"role": "system", "content": prompt}], max_tokens=300)
-    try:
-        focus_suggestions = json.loads(r.choices[0].message.content)
-    except Exception:
-        focus_suggestions = []
-    return focus_suggestions
-
-with st.expander("¿Sugerencias de reformulación del foco o pregunta raíz?"):
-    focus_suggestions = sugerir_reformulaciones(root_question, trees["Ética"], mode, chat)
-    if focus_suggestions:
-        for s in focus_suggestions:
-            st.info(f"> **Original:** {s.get('original')}")
-            for sug in s.get("suggestions", []):
-                st.write(f"- {sug}")
-        st.session_state["tracker"].log_focus_change(focus_suggestions)
-    else:
-        st.success("No se necesitan reformulaciones.")
+# El contenido solo se calcula cuando el usuario abre el desplegable (on_change="rerun").
+with st.expander(
+    "¿Sugerencias de reformulación del foco o pregunta raíz?", key="exp_reformulaciones", on_change="rerun"
+) as exp_reformulaciones:
+    if exp_reformulaciones.open:
+        # Llamada de baja prioridad: solo se lanza si hay margen de presupuesto y de rate limit
+        if "focus_suggestions" not in state:
+            try:
+                with span("app.reformulaciones"):
+                    state["focus_suggestions"] = sugerir_reformulaciones(
+                        root_question, get_tree("Ética"), mode, chat_low,
+                        max_context_tokens=REFORMULATION_CONTEXT_TOKENS
+                    )
+                if state["focus_suggestions"]:
+                    state["tracker"].log_focus_change(state["focus_suggestions"])
+            except CallDeferred:
+                st.info("Sugerencias aplazadas para no agotar el presupuesto de tokens. Se intentarán de nuevo más tarde.")
+        focus_suggestions = state.get("focus_suggestions")
+        if focus_suggestions:
+            for s in focus_suggestions:
+                st.info(f"> **Original:** {s.get('original')}")
+                for sug in s.get("suggestions", []):
+                    st.write(f"- {sug}")
+        elif focus_suggestions is not None:
+            st.success("No se necesitan reformulaciones.")
 
 # ---- 7. Visualización y navegación ----
 st.header("2. Explora los árboles desde diferentes perspectivas")
-marco = st.selectbox("Elige perspectiva de análisis", list(trees.keys()))
+marco = st.selectbox("Elige perspectiva de análisis", list(PERSPECTIVES.keys()))
 st.subheader(f"Árbol de subpreguntas ({marco})")
 
-def build_dot(node):
-    node_name = node.get("node", "<sin etiqueta>")
-    node_state = st.session_state["tracker"].log.get("node_states", {}).get(node_name, {}).get("state", "Abierta")
-    color_map = {
-        "Abierta": "limegreen",
-        "Resuelta": "deepskyblue",
-        "En disputa": "orange",
-        "Suspendida": "gray"
-    }
-    emoji_map = {
-        "Abierta": "🟢",
-        "Resuelta": "🔵",
-        "En disputa": "🟠",
-        "Suspendida": "⚪"
-    }
-    color = color_map.get(node_state, "black")
-    emoji = emoji_map.get(node_state, "🟢")
-    label = f"{emoji} {node_name}"
-
-    dot = f'"{label}" [style=filled, fillcolor={color}, shape=box, fontname="Arial", fontsize=14];\n'
-    for child in node.get("children", []):
-        c_label = child.get("node", "<sin etiqueta>")
-        child_state = st.session_state["tracker"].log.get("node_states", {}).get(c_label, {}).get("state", "Abierta")
-        c_emoji = emoji_map.get(child_state, "🟢")
-        c_label_full = f"{c_emoji} {c_label}"
-        dot += f'"{label}" -> "{c_label_full}";\n'
-        dot += build_dot(child)
-    return dot
-
-root = trees[marco]
-dot = f'digraph G {{\nrankdir=TB;\nnode [style=filled, fontname="Arial"];\n{build_dot(root)}}}'
-st.graphviz_chart(dot, use_container_width=True)
+# Solo se espera por el marco elegido; el resto se precarga en segundo plano.
+with st.spinner("Generando árbol de subpreguntas…"), span("app.arboles"):
+    root = get_tree(marco)
+prefetch_remaining_trees()
+# DOT cacheado por marco: solo se recalculan los nodos que cambian de estado o se injertan
+graphs = state.setdefault("graphs", {})
+if marco not in graphs or graphs[marco].tree is not root:
+    graphs[marco] = TreeGraph(root)
+graph = graphs[marco]
+graph.set_aliases(get_shared_graph().aliases())
+with span("app.grafo_dot"):
+    dot = graph.dot(shared_node_states())
+    st.graphviz_chart(dot, use_container_width=True)
+
+# ---- Precarga especulativa de respuestas (opcional) ----
+if speculate:
+    if "prefetcher" not in st.session_state:
+        st.session_state["prefetcher"] = SpeculativePrefetcher(
+            get_prefetch_executor(),
+            chat_low,
+            token_limit=int(os.getenv("CODIGO_PREFETCH_TOKENS", "3000")),
+            top_k=int(os.getenv("CODIGO_PREFETCH_K", "3")),
+        )
+    st.session_state["prefetcher"].canonical = canonical
+    st.session_state["prefetcher"].resume()
+    st.session_state["prefetcher"].schedule(root, marco)
+    # Las respuestas precargadas pasan al slot: cuentan en la huella y se vuelcan con el resto
+    state.setdefault("prefetched", {}).update(st.session_state["prefetcher"].drain())
+elif "prefetcher" in st.session_state:
+    st.session_state["prefetcher"].cancel()
+
+with st.expander("Profundizar: expandir una subpregunta sin regenerar el árbol"):
+    expand_path = st.selectbox(
+        "Subpregunta a desarrollar",
+        graph.paths,
+        format_func=graph.path_label,
+        key=f"expand_path_{marco}"
+    )
+    if st.button("Expandir subpregunta"):
+        with st.spinner("Generando subpreguntas hijas…"), span("app.expandir_nodo"):
+            try:
+                new_children = expand_node(root, expand_path, root_question, mode, chat_fn=chat)
+            except BudgetExceeded as e:
+                st.error(f"⛔ {e}")
+                stop()
+        if new_children:
+            graph.graft(expand_path, new_children)
+            state.pop("shared_graph", None)
+            state["tracker"].log_event(
+                "expansion",
+                [c["node"] for c in new_children],
+                marco=marco,
+                parent_node=graph.label(graph.nodes[expand_path])
+            )
+            st.session_state["usage"].add_nodes(len(new_children))
+            st.rerun()
+        else:
+            st.warning("El modelo no ha propuesto nuevas subpreguntas para este nodo.")
 
 with st.expander("Ver leyenda de colores del grafo"):
     st.markdown(
@@ -205,30 +393,93 @@ with st.expander("Ver leyenda de colores del grafo"):
         """
     )
 
-with st.expander("Mostrar subpreguntas en formato de lista"):
-    def render_list(node, indent=0):
-        node_name = node.get('node', '<sin título>')
-        node_state = st.session_state["tracker"].log.get("node_states", {}).get(node_name, {}).get("state", "Abierta")
-        emoji = {"Abierta":"🟢", "Resuelta":"🔵", "En disputa":"🟠", "Suspendida":"⚪"}.get(node_state,"🟢")
-        st.markdown(" " * indent * 2 + f"- {emoji} **{node_name}**")
-        for c in node.get("children", []):
-            render_list(c, indent + 1)
-    render_list(root)
+LIST_PAGE_SIZE = 50
+
+with st.expander(
+    "Mostrar subpreguntas en formato de lista", key="exp_lista", on_change="rerun"
+) as exp_lista:
+    if exp_lista.open:
+        # Una sola llamada a st.markdown por página, sobre las rutas ya aplanadas del TreeGraph
+        def render_list(paths):
+            node_states = shared_node_states()
+            lines = []
+            for path in paths:
+                node_name = graph.label(graph.nodes[path])
+                node_state = node_states.get(canonical(node_name), {}).get("state", "Abierta")
+                emoji = {"Abierta":"🟢", "Resuelta":"🔵", "En disputa":"🟠", "Suspendida":"⚪"}.get(node_state,"🟢")
+                lines.append("&nbsp;" * 4 * len(path) + f"{emoji} **{node_name}**")
+            st.markdown("  \n".join(lines))
+
+        filtro_lista = st.text_input("Filtrar subpreguntas", key=f"filtro_lista_{marco}")
+        paths = [
+            p for p in graph.paths
+            if not filtro_lista or filtro_lista.casefold() in graph.label(graph.nodes[p]).casefold()
+        ]
+        pages = page_count(len(paths), LIST_PAGE_SIZE)
+        page = st.number_input(
+            f"Página (de {pages})", min_value=1, max_value=pages, value=1,
+            key=f"pagina_lista_{marco}_{filtro_lista}_{pages}"
+        )
+        visible, _ = paginate(paths, page, LIST_PAGE_SIZE)
+        st.caption(f"{len(paths)} subpreguntas · página {page} de {pages}")
+        render_list(visible)
+
+with st.expander(
+    "Subpreguntas comunes entre perspectivas", key="exp_comunes", on_change="rerun"
+) as exp_comunes:
+    if exp_comunes.open:
+        shared = get_shared_graph()
+        if len(state.get("trees", {})) < len(PERSPECTIVES):
+            st.caption(
+                "Se incluyen los marcos ya generados; el resto se añadirá al terminar su precarga "
+                "(el botón de abajo espera o genera los que falten)."
+            )
+        st.write(shared.report())
+        for c in shared.shared_nodes():
+            marcos = sorted({m for m, _ in c["members"]})
+            st.markdown(f"- **{c['label']}** ({', '.join(marcos)})")
+        if st.button("Generar respuestas de todos los árboles (una vez por subpregunta común)"):
+            with st.spinner("Generando respuestas por nodo canónico…"), span("app.respuestas_compartidas"):
+                # Todos los marcos, no solo los visitados: los pendientes se recogen o se generan ahora
+                for pending in PERSPECTIVES:
+                    get_tree(pending)
+                shared = get_shared_graph()
+                try:
+                    responses, _, report = generate_shared_responses(
+                        state["trees"], mode, chat, shared=shared,
+                        known=state["tracker"].log.get("responses", {})
+                    )
+                except BudgetExceeded as e:
+                    st.error(f"⛔ {e}")
+                    stop()
+            for label in responses:
+                pin_canonical(label)
+            current_resps = state["tracker"].log.get("responses", {})
+            current_resps.update(responses)
+            state["tracker"].log_responses(current_resps)
+            state["tracker"].log_event("respuestas_compartidas", report, marco=marco)
+            st.success(
+                f"{report['llamadas_realizadas']} llamadas al modelo; "
+                f"{report['llamadas_ahorradas']} ahorradas frente a una por nodo."
+            )
 
 # ---- Indicadores de uso/impacto ----
-with st.expander("Indicadores de uso / impacto"):
-    m = st.session_state["usage"].metrics
-    st.metric("Sesiones totales", m["total_sessions"])
-    st.metric("Feedback total", m["total_feedback"])
-    st.metric("Nodos/subpreguntas tratados", m["total_nodes"])
-    st.write("Historial de sesiones (últimas 5):")
-    st.write(m["session_logs"][-5:])
+with st.expander("Indicadores de uso / impacto", key="exp_impacto", on_change="rerun") as exp_impacto:
+    if exp_impacto.open:
+        m = st.session_state["usage"].metrics
+        st.metric("Sesiones totales", m["total_sessions"])
+        st.metric("Feedback total", m["total_feedback"])
+        st.metric("Nodos/subpreguntas tratados", m["total_nodes"])
+        st.write("Historial de sesiones (últimas 5):")
+        st.write(m["session_logs"][-5:])
 
 # ---- 8. Selección de nodo, estado y justificación ----
 node_selected = st.text_input("¿Sobre qué subpregunta quieres profundizar?")
 if st.button("Seleccionar subpregunta"):
-    st.session_state["tracker"].log_event("seleccion", node_selected, marco=marco)
-    st.session_state["node_selected"] = node_selected
+    state["tracker"].log_event("seleccion", node_selected, marco=marco)
+    st.session_state["node_selected"] = canonical(node_selected)
+    if st.session_state["node_selected"] != node_selected:
+        st.caption(f"Unificada con la subpregunta equivalente: «{st.session_state['node_selected']}»")
 
 if "node_selected" in st.session_state:
     st.subheader("Estado epistémico de la subpregunta")
@@ -238,7 +489,7 @@ if "node_selected" in st.session_state:
         "En disputa": "🟠 En disputa",
         "Suspendida": "⚪ Suspendida"
     }
-    estado_actual = st.session_state["tracker"].log.get("node_states", {}).get(
+    estado_actual = shared_node_states().get(
         st.session_state["node_selected"], {}
     ).get("state", "Abierta")
     nuevo_estado = st.radio(
@@ -248,13 +499,16 @@ if "node_selected" in st.session_state:
         format_func=lambda x: estados[x]
     )
     if st.button("Actualizar estado epistémico"):
-        st.session_state["tracker"].set_node_state(st.session_state["node_selected"], nuevo_estado)
+        pin_canonical(st.session_state["node_selected"])
+        entry = state["tracker"].set_node_state(st.session_state["node_selected"], nuevo_estado, marco=marco)
+        if sync:
+            sync.publish_state(st.session_state["node_selected"], entry)
         st.success(f"Estado actualizado a: {estados[nuevo_estado]}")
 
     st.subheader("Justifica tu selección antes de continuar")
     justificacion = st.text_area("Explica por qué esta subpregunta es clave para la indagación:")
     if st.button("Guardar justificación y avanzar"):
-        st.session_state["tracker"].log_event(
+        state["tracker"].log_event(
             "justificacion",
             justificacion,
             marco=marco,
@@ -267,72 +521,88 @@ if "node_selected" in st.session_state:
     comment_author = st.text_input("Tu nombre o alias:", key="comment_author")
     tipo = st.radio("Tipo de feedback:", ("Humano (pares/docente)", "IA"), key="tipo_feedback")
     if st.button("Añadir comentario"):
-        st.session_state["tracker"].add_feedback(
+        pin_canonical(st.session_state["node_selected"])
+        entry = state["tracker"].add_feedback(
             st.session_state["node_selected"],
             comment_text,
             author=comment_author if comment_author else "Anónimo",
-            tipo=tipo
+            tipo=tipo,
+            marco=marco
         )
+        if sync:
+            sync.publish_feedback(st.session_state["node_selected"], entry)
         st.session_state["usage"].add_feedback()
         st.success("¡Comentario añadido!")
 
-    feedbacks = st.session_state["tracker"].log.get("feedback", {}).get(st.session_state["node_selected"], [])
-    if feedbacks:
-        st.markdown("#### Comentarios recibidos:")
-        for fb in feedbacks:
-            st.markdown(f"- _{fb['author']} ({fb['tipo']}):_ {fb['comment']}")
-    else:
-        st.info("Aún no hay comentarios en esta subpregunta.")
+    # Solo este bloque se refresca periódicamente con lo que publican otras sesiones
+    @st.fragment(run_every=SYNC_INTERVAL if sync else None)
+    def feedback_en_vivo():
+        if state.spilled:
+            # Sesión inactiva volcada a disco: el refresco automático no la rehidrata
+            st.caption("Sesión en reposo: interactúa con la página para ver el feedback nuevo.")
+            return
+        with state.hold():
+            node = st.session_state["node_selected"]
+            if sync:
+                sync.apply(state["live_remote"], resolve=pin_canonical)
+            estado = shared_node_states().get(node, {}).get("state", "Abierta")
+            st.caption(f"Estado compartido: {estados.get(estado, estado)}")
+            local = state["tracker"].log.get("feedback", {})
+            feedbacks = merged_feedback(local, state["live_remote"], node) if sync else local.get(node, [])
+            if feedbacks:
+                st.markdown("#### Comentarios recibidos:")
+                for fb in feedbacks:
+                    st.markdown(f"- _{fb['author']} ({fb['tipo']}):_ {fb['comment']}")
+            else:
+                st.info("Aún no hay comentarios en esta subpregunta.")
+
+    feedback_en_vivo()
 
 # ---- 9. Generar y comparar respuestas multiperspectiva ----
-def generar_respuestas_multiperspectiva(nodo, marco, chat_fn):
-    prompt = (
-        f"Analiza la siguiente cuestión desde tres perspectivas.\n"
-        f"Subpregunta: “{nodo}”\n"
-        f"Marco seleccionado: {marco}\n"
-        "Proporciona tres respuestas bien argumentadas y diferenciadas:\n"
-        "1. Perspectiva ética (deontología, utilitarismo, ética del cuidado).\n"
-        "2. Perspectiva histórico-sociopolítica relevante.\n"
-        "3. Perspectiva crítica epistemológica o filosófica.\n"
-        "Responde solo en JSON:\n"
-        '[{"label": "Ética", "text": "..."}, {"label": "Histórico-Social", "text": "..."}, {"label": "Epistemológica", "text": "..."}]'
-    )
-    r = chat_fn([{"role": "system", "content": prompt}], max_tokens=700)
-    try:
-        data = json.loads(r.choices[0].message.content)
-    except Exception:
-        data = []
-    return data
-
 if "node_selected" in st.session_state:
     st.subheader("Genera y compara respuestas multiperspectiva")
     if st.button("Obtener respuestas multiperspectiva"):
-        respuestas = generar_respuestas_multiperspectiva(
-            st.session_state["node_selected"], marco, chat
-        )
-        st.session_state["respuestas_multiperspectiva"] = respuestas
+        try:
+            with span("app.respuestas_multiperspectiva"):
+                # Respuestas ya generadas para el nodo canónico (en cualquier marco)
+                respuestas = state["tracker"].log.get("responses", {}).get(st.session_state["node_selected"])
+                if respuestas:
+                    current_span().add(cache_hits=1)
+                if not respuestas and speculate and "prefetcher" in st.session_state:
+                    respuestas = st.session_state["prefetcher"].get(
+                        st.session_state["node_selected"], marco, store=state.get("prefetched")
+                    )
+                if not respuestas:
+                    respuestas = generar_respuestas_multiperspectiva(
+                        st.session_state["node_selected"], marco, chat
+                    )
+        except BudgetExceeded as e:
+            st.error(f"⛔ {e}")
+            stop()
+        state["respuestas_multiperspectiva"] = respuestas
 
         # --- REGISTRO EXPLÍCITO PARA EL INFORME ---
-        current_resps = st.session_state["tracker"].log.get("responses", {})
+        pin_canonical(st.session_state["node_selected"])
+        current_resps = state["tracker"].log.get("responses", {})
         current_resps[st.session_state["node_selected"]] = respuestas
-        st.session_state["tracker"].log_responses(current_resps)
+        state["tracker"].log_responses(current_resps)
 
-        st.session_state["tracker"].log_event(
+        state["tracker"].log_event(
             "respuestas_multiperspectiva",
             respuestas,
             marco=marco,
             parent_node=st.session_state["node_selected"]
         )
 
-if "respuestas_multiperspectiva" in st.session_state:
+if "respuestas_multiperspectiva" in state:
     st.markdown("### Respuestas contrastadas para la subpregunta seleccionada:")
-    for item in st.session_state["respuestas_multiperspectiva"]:
+    for item in state["respuestas_multiperspectiva"]:
         st.markdown(f"**{item['label']}**: {item['text']}")
     st.info("Reflexiona y compara las respuestas antes de continuar.")
 
     seleccion_usuario = st.radio(
         "¿Cuál perspectiva te parece más fundamentada/interesante para este caso?",
-        [r["label"] for r in st.session_state["respuestas_multiperspectiva"]],
+        [r["label"] for r in state["respuestas_multiperspectiva"]],
         index=0,
         key="seleccion_perspectiva"
     )
@@ -341,7 +611,7 @@ if "respuestas_multiperspectiva" in st.session_state:
         key="justificacion_perspectiva"
     )
     if st.button("Registrar elección y reflexión"):
-        st.session_state["tracker"].log_event(
+        state["tracker"].log_event(
             "eleccion_perspectiva",
             {
                 "perspectiva": seleccion_usuario,
@@ -354,16 +624,56 @@ if "respuestas_multiperspectiva" in st.session_state:
 
 # ---- 10. Exportación y visualización de Reasoning Tracker ----
 st.header("3. Exporta y revisa tu proceso deliberativo")
-razonamiento = st.session_state["tracker"].export()
+razonamiento = state["tracker"].export()
 st.download_button("Descargar razonamiento (JSON)", razonamiento, file_name="razonamiento.json")
 
-import io
 if st.button("Descargar informe deliberativo en HTML"):
-    html_content = generate_html_report(st.session_state["tracker"].log)
+    html_content = generate_html_report(state["tracker"].log)
     st.download_button("Descargar informe (HTML)", data=html_content, file_name="informe_deliberativo.html", mime="text/html")
 
+if st.button("Descargar eventos en formato columnar"):
+    # Una fila por paso, feedback o cambio de estado (ver modules/columnar_export.py)
+    rows, _ = rows_since(state["tracker"].log, st.session_state["session_id"])
+    if has_pyarrow():
+        st.download_button("Descargar eventos (Parquet)", data=to_parquet_bytes(rows), file_name="eventos.parquet")
+    else:
+        st.download_button("Descargar eventos (CSV)", data=to_csv_bytes(rows), file_name="eventos.csv", mime="text/csv")
+
+HISTORY_PAGE_SIZES = [25, 50, 100]
+
 if st.checkbox("Ver historial de razonamiento"):
-    st.json(st.session_state["tracker"].log)
+    # Solo se envía al navegador la página visible de pasos, no el registro completo
+    log = state["tracker"].log
+    index = state.setdefault("step_index", StepIndex()).update(log["steps"])
+    st.write({
+        "root": log["root"],
+        "pasos": len(log["steps"]),
+        "respuestas": len(log.get("responses") or {}),
+        "comentarios": sum(len(v) for v in (log.get("feedback") or {}).values()),
+        "estados": len(log.get("node_states") or {}),
+        "focos": len(log.get("focus") or []),
+    })
+    col_tipo, col_marco, col_nodo, col_tam = st.columns(4)
+    f_tipo = col_tipo.selectbox("Tipo de evento", ["(todos)"] + index.values("event_type"), key="hist_tipo")
+    f_marco = col_marco.selectbox("Marco", ["(todos)"] + index.values("marco"), key="hist_marco")
+    f_nodo = col_nodo.text_input("Subpregunta contiene", key="hist_nodo")
+    page_size = col_tam.selectbox("Pasos por página", HISTORY_PAGE_SIZES, index=1, key="hist_tam")
+    positions = index.query(
+        event_type=None if f_tipo == "(todos)" else f_tipo,
+        marco=None if f_marco == "(todos)" else f_marco,
+        node_contains=f_nodo or None,
+    )
+    pages = page_count(len(positions), page_size)
+    page = st.number_input(
+        f"Página (de {pages})", min_value=1, max_value=pages, value=pages,
+        key=f"hist_pagina_{f_tipo}_{f_marco}_{f_nodo}_{page_size}_{pages}"
+    )
+    visible, _ = paginate(positions, page, page_size)
+    st.caption(f"{len(positions)} pasos · página {page} de {pages}")
+    st.dataframe([step_row(log["steps"][i], i, limit=200) for i in visible], use_container_width=True, hide_index=True)
+    if visible:
+        detalle = st.selectbox("Ver paso completo", visible, index=len(visible) - 1, key=f"hist_detalle_{page}")
+        st.json(log["steps"][detalle])
 
 # ---- Reporte de impacto ----
 def generar_reporte_impacto(metrics):
@@ -393,49 +703,9 @@ if st.button("Exportar reporte de impacto (HTML)"):
 # ---- DASHBOARD EEE ----
 st.header("4. Índice de Equilibrio Erotético (EEE) y Dashboard Epistémico")
 
-def calcular_eee(tracker):
-    log = tracker.log
-    root = log.get("inquiry", {})
-    steps = log.get("steps", [])
-    feedback = log.get("feedback", {})
-    node_states = log.get("node_states", {})
-
-    def depth(n):
-        if not n or not isinstance(n, dict):
-            return 0
-        return 1 + max([depth(child) for child in n.get("children", [])] or [0])
-    profundidad = depth(root) if root else 0
-    norm_prof = min(profundidad / 6, 1)
-
-    resp = log.get("responses", {})
-    pluralidad = np.mean([len(lst) for lst in resp.values()]) if resp else 0
-    norm_plur = min(pluralidad / 3, 1)
-
-    trazabilidad = len(steps)
-    norm_traz = min(trazabilidad / 12, 1)
-
-    cambios_estado = sum([1 for s in steps if s["event_type"] in ["estado_modificado", "reformulacion"]])
-    norm_rev = min((cambios_estado + 1) / (profundidad + 1), 1) if profundidad else 0
-
-    disputas = sum(1 for v in node_states.values() if v.get("state") == "En disputa")
-    total_nodos = len(node_states) if node_states else 1
-    norm_rob = min(disputas / total_nodos, 1) if total_nodos else 0
-
-    eee = round(np.mean([norm_prof, norm_plur, norm_traz, norm_rev, norm_rob]), 3)
-
-    return {
-        "EEE Global": eee,
-        "Profundidad estructural": round(norm_prof, 2),
-        "Pluralidad semántica": round(norm_plur, 2),
-        "Trazabilidad razonadora": round(norm_traz, 2),
-        "Reversibilidad efectiva": round(norm_rev, 2),
-        "Robustez ante disenso": round(norm_rob, 2),
-        "Profundidad bruta": profundidad,
-        "Pasos razonamiento": trazabilidad,
-        "Nodos en disputa": disputas
-    }
-
-eee_dict = calcular_eee(st.session_state["tracker"])
+with span("app.eee"):
+    # Profundidad del árbol del marco elegido, mantenida por TreeGraph al injertar
+    eee_dict = calcular_eee(state["tracker"], profundidad=graph.depth)
 st.metric("EEE Global", f"{eee_dict['EEE Global']} / 1.00")
 st.write("**Desglose de dimensiones:**")
 st.table([
@@ -446,6 +716,9 @@ st.table([
     ["Robustez ante disenso", eee_dict["Robustez ante disenso"]]
 ])
 
+# Import diferido: plotly solo se carga al llegar al radar del EEE
+import plotly.graph_objects as go
+
 fig = go.Figure()
 dimensiones = [
     "Profundidad estructural",
@@ -548,3 +821,56 @@ with st.expander("Cumplimiento normativo y ético"):
 
     """)
 
+
+# ---- EXPORTACIÓN COLUMNAR INCREMENTAL (opcional, CODIGO_EXPORT_DIR) ----
+@st.cache_resource
+def get_columnar_exporter(path):
+    exporter = ColumnarExporter(path)
+    if exporter.fmt == "csv":
+        # Sin pyarrow: CSV compacto dentro del directorio (con su diccionario .dict.json)
+        os.makedirs(path, exist_ok=True)
+        exporter.path = os.path.join(path, "eventos.csv")
+    # Al resetear u olvidar una sesión se descarta su cursor de exportación
+    get_memory_manager().forget_listeners.append(exporter.forget)
+    return exporter
+
+if os.getenv("CODIGO_EXPORT_DIR"):
+    # Solo se añaden las filas nuevas desde la ejecución anterior; se escriben por lotes
+    with span("app.export_columnar"):
+        get_columnar_exporter(os.getenv("CODIGO_EXPORT_DIR")).append_session(
+            state["tracker"].log, st.session_state["session_id"], owner=st.session_state["memory_slot"]
+        )
+
+# ---- CONSUMO DE TOKENS ----
+b = budget.summary()
+st.sidebar.caption(
+    f"Tokens: sesión {b['tokens_sesion']}/{b['limite_sesion']} · "
+    f"hoy {b['tokens_hoy']}/{b['limite_dia']} ({budget.institution})"
+    + (f" · {b['aplazadas']} llamadas aplazadas" if b["aplazadas"] else "")
+)
+if speculate and "prefetcher" in st.session_state:
+    p = st.session_state["prefetcher"].summary()
+    st.sidebar.caption(
+        f"Precarga: {p['precargadas']} listas, {p['en_curso']} en curso, {p['aciertos']} aciertos · "
+        f"{p['tokens_especulativos']}/{p['limite_tokens']} tokens"
+    )
+
+# ---- PANEL DE RENDIMIENTO (opcional) ----
+if tracer.enabled:
+    with st.expander("Rendimiento"):
+        st.write("**Última ejecución (por etapa):**")
+        st.table(tracer.summary(run=tracer.run) or [{"etapa": "—"}])
+        st.write("**Acumulado de la sesión:**")
+        st.table(tracer.summary() or [{"etapa": "—"}])
+        st.download_button("Descargar trazas (JSONL)", tracer.to_jsonl(), file_name="trazas_rendimiento.jsonl")
+        st.download_button(
+            "Descargar métricas (Prometheus)",
+            tracer.to_prometheus(),
+            file_name="metricas_rendimiento.prom",
+            mime="text/plain"
+        )
+        st.write("**Memoria de sesiones del servidor:**")
+        st.write(memory.summary())
+
+# ---- Fin de la ejecución: huella de la sesión, volcado de inactivas y techo global ----
+memory.checkout(state)
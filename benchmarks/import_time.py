@@ -0,0 +1,90 @@
+# benchmarks/import_time.py
+"""
+Presupuesto de tiempo de arranque de app.py basado en `python -X importtime`.
+
+Ejecuta en un proceso limpio los imports de nivel superior de app.py y falla
+(código 1) si el tiempo acumulado supera el presupuesto o si se carga alguno
+de los módulos pesados que deben diferirse hasta la sección que los usa.
+
+Uso:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --max-ms 1200 --output import_time.json
+"""
+
+import os
+import sys
+import ast
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.json")
+
+
+def top_level_imports(path):
+    """Código con los import de nivel de módulo de `path` (los diferidos no cuentan)."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    stmts = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in stmts)
+
+
+def measure_once(code):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package" (la sangría indica anidamiento)
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative_us)
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative_us)
+    return total_us, modules
+
+
+def main(argv=None):
+    with open(BUDGET_PATH, "r") as f:
+        budget = json.load(f)
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de import de app.py.")
+    parser.add_argument("--max-ms", type=float, default=budget["max_ms"])
+    parser.add_argument("--repeat", type=int, default=5, help="Se toma el mejor de N procesos.")
+    parser.add_argument("--output", help="Fichero JSON de salida (por defecto stdout).")
+    args = parser.parse_args(argv)
+
+    code = top_level_imports(os.path.join(ROOT, "app.py"))
+    runs = [measure_once(code) for _ in range(args.repeat)]
+    total_us, modules = min(runs, key=lambda r: r[0])
+    loaded_forbidden = sorted(m for m in budget["forbidden"] if m in modules)
+    slowest = sorted(modules.items(), key=lambda kv: kv[1], reverse=True)[:15]
+
+    report = {
+        "total_ms": round(total_us / 1000, 2),
+        "max_ms": args.max_ms,
+        "forbidden_loaded": loaded_forbidden,
+        "slowest_cumulative_ms": {name: round(us / 1000, 2) for name, us in slowest},
+        "ok": total_us / 1000 <= args.max_ms and not loaded_forbidden,
+    }
+    out = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out)
+    else:
+        print(out)
+    if not report["ok"]:
+        print(
+            f"Arranque fuera de presupuesto: {report['total_ms']} ms (máx. {args.max_ms} ms), "
+            f"módulos pesados cargados: {loaded_forbidden or 'ninguno'}",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
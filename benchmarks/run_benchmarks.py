@@ -0,0 +1,202 @@
+# benchmarks/run_benchmarks.py
+"""
+Suite de benchmarks del Código Deliberativo sobre el backend falso (modules/fake_llm.py).
+
+Uso:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --quick --compare bench.json --threshold 1.5
+
+El resultado es JSON legible por máquina; con --compare se devuelve código 1 si
+algún caso supera en `threshold` veces la mediana registrada en la línea base.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.fake_llm import FakeLLM  # noqa: E402
+from modules.multiperspective import generate_trees, build_graph, count_nodes, TreeGraph  # noqa: E402
+from modules.contextual_generator import generate_responses  # noqa: E402
+from modules.html_exporter import generate_html_report  # noqa: E402
+from modules.eee_evaluator import calcular_eee  # noqa: E402
+from modules.reasoning_tracker import ReasoningTracker  # noqa: E402
+from modules.usage_metrics import UsageMetrics  # noqa: E402
+from modules.tracing import Tracer, activate, traced  # noqa: E402
+from modules.batch_eee import score_path  # noqa: E402
+from modules.dedup import merge_trees  # noqa: E402
+from modules.step_index import StepIndex, paginate  # noqa: E402
+
+# Tamaños "realista" (lo que devuelve el modelo hoy) y "extremo" (1k nodos, 10k pasos)
+SIZES = {
+    "realista": {"branching": 4, "depth": 2, "steps": 50, "sessions": 200},
+    "extremo": {"branching": 10, "depth": 3, "steps": 10000, "sessions": 5000},
+}
+EVENT_TYPES = ["seleccion", "justificacion", "estado_modificado", "respuestas_multiperspectiva", "eleccion_perspectiva"]
+STATES = ["Abierta", "Resuelta", "En disputa", "Suspendida"]
+
+
+def _iter_nodes(node):
+    yield node
+    for child in node.get("children", []):
+        yield from _iter_nodes(child)
+
+
+def build_tracker(branching, depth, steps):
+    """Crea un tracker sintético con árbol, respuestas, pasos, feedback y estados."""
+    llm = FakeLLM(branching=branching, depth=depth)
+    tree = generate_trees("¿Es ético el uso de IA en diagnósticos médicos?", llm)["Ética"]
+    tracker = ReasoningTracker("¿Es ético el uso de IA en diagnósticos médicos?")
+    tracker.log_inquiry(tree)
+    nodes = [n["node"] for n in _iter_nodes(tree)]
+    tracker.log_responses({
+        n: [{"label": "Ética", "text": "..."}, {"label": "Histórico-Social", "text": "..."}]
+        for n in nodes[:200]
+    })
+    for i in range(steps):
+        node = nodes[i % len(nodes)]
+        tracker.log_event(EVENT_TYPES[i % len(EVENT_TYPES)], f"Contenido del paso {i}", marco="Ética", parent_node=node)
+        if i % 10 == 0:
+            tracker.add_feedback(node, f"Comentario {i}", author="Docente")
+        if i % 7 == 0:
+            tracker.set_node_state(node, STATES[i % len(STATES)])
+    return tracker
+
+
+def measure(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.mean(timings),
+        "max_s": max(timings),
+    }
+
+
+def run(repeat, sizes, latency=0.0, jitter=0.0):
+    results = []
+
+    def record(name, size, fn, **extra):
+        stats = measure(fn, repeat)
+        results.append({"name": name, "size": size, **extra, **stats})
+        print(f"{name:<32} {size:<9} median={stats['median_s'] * 1000:9.2f} ms", file=sys.stderr)
+
+    for size in sizes:
+        cfg = SIZES[size]
+        llm = FakeLLM(branching=cfg["branching"], depth=cfg["depth"], latency=latency, jitter=jitter)
+        trees = generate_trees("Pregunta de benchmark", llm)
+        tree = trees["Ética"]
+        n_nodes = count_nodes(tree)
+        tracker = build_tracker(cfg["branching"], cfg["depth"], cfg["steps"])
+        node_states = tracker.log["node_states"]
+
+        record("generate_trees", size, lambda: generate_trees("Pregunta de benchmark", llm), nodes=n_nodes)
+        record("contextual_generate_responses", size,
+               lambda: generate_responses(tree, "Guiado (intermedio)", chat_fn=llm), nodes=n_nodes)
+        record("generate_html_report", size, lambda: generate_html_report(tracker.log),
+               nodes=n_nodes, steps=cfg["steps"])
+        record("calcular_eee", size, lambda: calcular_eee(tracker), nodes=n_nodes, steps=cfg["steps"])
+        record("step_index_page", size,
+               lambda: paginate(StepIndex().update(tracker.log["steps"]).query(marco="Ética"), 1, 50),
+               steps=cfg["steps"])
+        record("build_graph", size, lambda: build_graph(tree, node_states), nodes=n_nodes)
+        graph = TreeGraph(tree)
+        record("tree_graph_dot_cached", size, lambda: graph.dot(node_states), nodes=n_nodes)
+        record("merge_trees", size, lambda: merge_trees(trees), nodes=sum(count_nodes(t) for t in trees.values()))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            usage = UsageMetrics(path=os.path.join(tmp, "usage_metrics.json"))
+            for i in range(cfg["steps"] // 10):
+                usage.new_session(f"Pregunta {i}")
+
+            def writes():
+                for _ in range(10):
+                    usage.add_feedback()
+            record("usage_metrics_10_writes", size, writes, sessions=len(usage.metrics["session_logs"]))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # Archivo de sesiones exportadas para la puntuación EEE por lotes
+            small = build_tracker(4, 2, 50).export()
+            for i in range(cfg["sessions"]):
+                with open(os.path.join(tmp, f"razonamiento_{i}.json"), "w") as f:
+                    f.write(small)
+            record("batch_eee_score_path", size, lambda: score_path(tmp), sessions=cfg["sessions"])
+
+    # Coste del decorador @traced con las trazas desactivadas (debe ser despreciable)
+    @traced("bench.noop")
+    def noop():
+        return None
+
+    def calls():
+        for _ in range(100000):
+            noop()
+    activate(Tracer(enabled=False))
+    record("traced_noop_100k_disabled", "micro", calls)
+    activate(None)
+
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path, "r") as f:
+        baseline = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get((r["name"], r["size"]))
+        if base and base["median_s"] > 0 and r["median_s"] / base["median_s"] > threshold:
+            regressions.append({
+                "name": r["name"],
+                "size": r["size"],
+                "baseline_median_s": base["median_s"],
+                "median_s": r["median_s"],
+                "ratio": r["median_s"] / base["median_s"],
+            })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del Código Deliberativo (backend LLM falso).")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Solo tamaño realista y 1 repetición.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por llamada (s).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variación uniforme ± de la latencia (s).")
+    parser.add_argument("--output", help="Fichero JSON de salida (por defecto stdout).")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior para detectar regresiones.")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    sizes = ["realista"] if args.quick else list(SIZES)
+    repeat = 1 if args.quick else args.repeat
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "llm": {"backend": "fake", "latency_s": args.latency, "jitter_s": args.jitter},
+        "results": run(repeat, sizes, latency=args.latency, jitter=args.jitter),
+    }
+    if args.compare:
+        report["regressions"] = compare(report["results"], args.compare, args.threshold)
+
+    out = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out)
+    else:
+        print(out)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,20 @@
 # modules/adaptive_dialogue.py
 
-import os
 import json
-import openai
 
-# Configura tu clave de OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from modules.tracing import traced
+from modules.token_budget import trim_tree
+from modules.openai_client import get_openai
 
-def adapt_focus(tree: dict, mode: str) -> list:
+@traced("adaptive_dialogue.adapt_focus")
+def adapt_focus(tree: dict, mode: str, max_context_tokens: int = None) -> list:
     """
     Analiza el árbol de indagación y sugiere hasta dos reformulaciones
     si detecta ambigüedad o falta de profundidad.
+    Con max_context_tokens el árbol enviado se recorta por niveles.
     """
+    if max_context_tokens:
+        tree = trim_tree(tree, max_context_tokens)
     prompt = f"""
 Eres un Motor de Diálogo Adaptativo para IA deliberativa.
 Árbol de indagación (JSON):
@@ -32,7 +35,7 @@ Modo de usuario: {mode}
 
 Si no hay nada que sugerir, devuelve [].
 """
-    resp = openai.ChatCompletion.create(
+    resp = get_openai().ChatCompletion.create(
         model="gpt-3.5-turbo",
         messages=[{"role": "system", "content": prompt}],
         temperature=0.7,
@@ -0,0 +1,258 @@
+# modules/batch_eee.py
+"""
+Puntuación EEE por lotes sobre archivos de sesiones exportadas
+(`razonamiento.json` de ReasoningTracker.export()).
+
+Lee un directorio, un .zip o un .tar(.gz) en streaming, extrae las
+características de cada sesión en un pool de procesos (una sola pasada por
+fichero) y calcula todas las dimensiones del EEE de golpe con arrays NumPy.
+
+Uso:
+    python -m modules.batch_eee exports/ --output eee.csv --workers 8
+"""
+
+import os
+import sys
+import csv
+import json
+import tarfile
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Orden de las columnas del array de características
+FEATURES = [
+    "profundidad",         # profundidad del árbol tal y como la mide calcular_eee
+    "nodos_con_respuesta",
+    "respuestas_total",
+    "pasos",
+    "cambios_estado",      # pasos estado_modificado / reformulacion
+    "nodos_en_disputa",
+    "nodos_con_estado",
+    "focos",               # sugerencias de foco registradas (calculate_eee)
+    "profundidad_clasica",  # profundidad tal y como la mide calculate_eee
+]
+DIMENSIONS = [
+    "Profundidad estructural",
+    "Pluralidad semántica",
+    "Trazabilidad razonadora",
+    "Reversibilidad efectiva",
+    "Robustez ante disenso",
+]
+
+
+def _depth(node):
+    """Profundidad iterativa (sin límite de recursión para árboles muy profundos)."""
+    if not node or not isinstance(node, dict):
+        return 0
+    best, stack = 0, [(node, 1)]
+    while stack:
+        n, d = stack.pop()
+        best = max(best, d)
+        for child in n.get("children", []) or []:
+            if isinstance(child, dict):
+                stack.append((child, d + 1))
+    return best
+
+
+def extract_features(log):
+    """Características numéricas de una sesión (ver FEATURES)."""
+    inquiry = log.get("inquiry") or {}
+    responses = log.get("responses") or {}
+    steps = log.get("steps") or []
+    node_states = log.get("node_states") or {}
+    classic_root = inquiry[0] if isinstance(inquiry, list) and inquiry else inquiry
+    return (
+        _depth(inquiry),
+        len(responses),
+        sum(len(v) for v in responses.values()),
+        len(steps),
+        sum(1 for s in steps if s.get("event_type") in ("estado_modificado", "reformulacion")),
+        sum(1 for v in node_states.values() if v.get("state") == "En disputa"),
+        len(node_states),
+        len(log.get("focus") or []),
+        _depth(classic_root),
+    )
+
+
+def _extract_chunk(chunk):
+    """
+    Trabajo de cada proceso: [(id, bytes)] -> ([(id, raíz, características)], [(id, motivo)]).
+    Un fichero mal formado se omite y se anota; nunca aborta el lote.
+    """
+    rows, skipped = [], []
+    for session_id, raw in chunk:
+        try:
+            log = json.loads(raw)
+            if not isinstance(log, dict):
+                raise TypeError("el JSON no es un objeto")
+            rows.append((session_id, log.get("root", ""), extract_features(log)))
+        except Exception as e:
+            skipped.append((session_id, f"{type(e).__name__}: {e}"))
+    return rows, skipped
+
+
+# ---- Lectura en streaming de las fuentes ----
+def iter_sessions(path):
+    """Genera (id, bytes) por cada .json de un directorio, .zip o .tar(.gz)."""
+    if os.path.isdir(path):
+        for dirpath, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith(".json"):
+                    full = os.path.join(dirpath, name)
+                    with open(full, "rb") as f:
+                        yield os.path.relpath(full, path), f.read()
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if info.filename.endswith(".json") and not info.is_dir():
+                    yield info.filename, zf.read(info)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, "r|*") as tf:
+            for member in tf:
+                if member.isfile() and member.name.endswith(".json"):
+                    yield member.name, tf.extractfile(member).read()
+    else:
+        with open(path, "rb") as f:
+            yield os.path.basename(path), f.read()
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def collect_features(path, workers=None, chunk_size=500):
+    """
+    Extrae las características de todas las sesiones de `path` en paralelo.
+    Se mantienen como mucho 2 lotes por proceso en vuelo para acotar la memoria.
+    Devuelve (ids, raíces, filas, omitidas), con omitidas = [(id, motivo)].
+    """
+    ids, roots, rows, skipped = [], [], [], []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in _chunks(iter_sessions(path), chunk_size):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    _merge(fut.result(), ids, roots, rows, skipped)
+            pending.add(pool.submit(_extract_chunk, chunk))
+        for fut in pending:
+            _merge(fut.result(), ids, roots, rows, skipped)
+    return ids, roots, rows, skipped
+
+
+def _merge(result, ids, roots, rows, skipped):
+    extracted, omitted = result
+    skipped.extend(omitted)
+    for session_id, root, features in extracted:
+        ids.append(session_id)
+        roots.append(root)
+        rows.append(features)
+
+
+def score_features(rows):
+    """
+    Calcula todas las dimensiones del EEE para una matriz (n_sesiones x FEATURES),
+    con las mismas fórmulas que eee_evaluator.calcular_eee y calculate_eee.
+    """
+    import numpy as np
+
+    f = np.asarray(rows, dtype=float).reshape(-1, len(FEATURES))
+    prof, n_resp, resp_total, pasos, cambios, disputas, n_estados, focos, prof_clasica = f.T
+
+    norm_prof = np.minimum(prof / 6, 1)
+    pluralidad = np.divide(resp_total, n_resp, out=np.zeros_like(resp_total), where=n_resp > 0)
+    norm_plur = np.minimum(pluralidad / 3, 1)
+    norm_traz = np.minimum(pasos / 12, 1)
+    norm_rev = np.where(prof > 0, np.minimum((cambios + 1) / (prof + 1), 1), 0)
+    norm_rob = np.minimum(disputas / np.maximum(n_estados, 1), 1)
+    dims = np.column_stack([norm_prof, norm_plur, norm_traz, norm_rev, norm_rob])
+
+    clasico = np.column_stack([
+        np.minimum(prof_clasica / 5, 1), norm_plur, np.minimum(focos / 2, 1)
+    ]).mean(axis=1)
+
+    return {
+        "EEE Global": np.round(dims.mean(axis=1), 3),
+        **{name: np.round(dims[:, i], 2) for i, name in enumerate(DIMENSIONS)},
+        "EEE clásico": clasico,
+        "features": f,
+    }
+
+
+def score_path(path, workers=None, chunk_size=500):
+    """
+    Devuelve (ids, raíces, puntuaciones) de todas las sesiones de `path`; las
+    sesiones omitidas por estar mal formadas van en puntuaciones["omitidas"].
+    """
+    ids, roots, rows, skipped = collect_features(path, workers=workers, chunk_size=chunk_size)
+    scores = score_features(rows)
+    scores["omitidas"] = skipped
+    return ids, roots, scores
+
+
+def write_table(out, ids, roots, scores):
+    writer = csv.writer(out)
+    columns = ["EEE Global"] + DIMENSIONS + ["EEE clásico"]
+    writer.writerow(["sesion", "root"] + columns + FEATURES)
+    features = scores["features"]
+    for i, session_id in enumerate(ids):
+        writer.writerow(
+            [session_id, roots[i]]
+            + [float(scores[c][i]) for c in columns]
+            + [int(v) for v in features[i]]
+        )
+
+
+def summarize(scores):
+    """Media, mediana y percentiles 10/90 de cada dimensión."""
+    import numpy as np
+
+    summary = {}
+    for name in ["EEE Global"] + DIMENSIONS + ["EEE clásico"]:
+        values = scores[name]
+        if len(values) == 0:
+            continue
+        summary[name] = {
+            "media": round(float(values.mean()), 3),
+            "mediana": round(float(np.median(values)), 3),
+            "p10": round(float(np.percentile(values, 10)), 3),
+            "p90": round(float(np.percentile(values, 90)), 3),
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Puntuación EEE por lotes de sesiones exportadas.")
+    parser.add_argument("path", help="Directorio, .zip o .tar(.gz) con razonamiento.json exportados.")
+    parser.add_argument("--output", help="CSV de salida con una fila por sesión (por defecto stdout).")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    ids, roots, scores = score_path(args.path, workers=args.workers, chunk_size=args.chunk_size)
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            write_table(f, ids, roots, scores)
+    else:
+        write_table(sys.stdout, ids, roots, scores)
+    skipped = scores["omitidas"]
+    print(json.dumps({
+        "sesiones": len(ids),
+        "omitidas": len(skipped),
+        "ejemplos_omitidas": [{"sesion": sid, "motivo": why} for sid, why in skipped[:20]],
+        "resumen": summarize(scores),
+    }, ensure_ascii=False, indent=2), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+# modules/columnar_export.py
+"""
+Exportación columnar de los registros de sesión: una fila por paso, feedback
+o cambio de estado, con columnas tipadas y cadenas de nodo/marco codificadas
+por diccionario.
+
+Destinos:
+- Parquet (si pyarrow está instalado): un fichero part-*.parquet por cada
+  volcado del búfer dentro de un directorio-dataset (legible con
+  pyarrow.dataset o pandas).
+- CSV compacto: los códigos enteros van en el CSV y los diccionarios en
+  `<fichero>.dict.json`. Ambos crecen de forma incremental.
+
+Las filas se acumulan en memoria y se escriben por tamaño (`flush_rows`),
+por tiempo (`flush_seconds`) o al salir del proceso, para no generar un
+fichero diminuto por cada ejecución del script.
+
+Uso como herramienta:
+    python -m modules.columnar_export exports/ --output eventos/ --format parquet
+"""
+
+import io
+import os
+import sys
+import csv
+import json
+import time
+import uuid
+import atexit
+import argparse
+import threading
+from datetime import datetime
+
+# (columna, tipo): "dict" = cadena codificada por diccionario, "str", "int", "timestamp"
+SCHEMA = [
+    ("session_id", "dict"),
+    ("root", "dict"),
+    ("kind", "dict"),         # step | feedback | state
+    ("seq", "int"),           # posición del evento dentro de su lista en la sesión
+    ("timestamp", "timestamp"),
+    ("event_type", "dict"),
+    ("marco", "dict"),
+    ("node", "dict"),
+    ("state", "dict"),
+    ("author", "dict"),
+    ("tipo", "dict"),
+    ("content", "str"),
+]
+COLUMNS = [name for name, _ in SCHEMA]
+DICT_COLUMNS = [name for name, kind in SCHEMA if kind == "dict"]
+
+
+def _content(value):
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def new_cursor():
+    """Posición ya exportada de una sesión (para appends incrementales)."""
+    return {"steps": 0, "feedback": {}, "states": {}}
+
+
+def rows_since(log, session_id, cursor=None):
+    """
+    Filas nuevas de `log` desde `cursor` (None = todas). Devuelve (filas, cursor_nuevo);
+    los cambios de estado se detectan por su timestamp.
+    """
+    cursor = json.loads(json.dumps(cursor)) if cursor else new_cursor()
+    root = log.get("root", "")
+    rows = []
+
+    steps = log.get("steps") or []
+    for i in range(cursor["steps"], len(steps)):
+        s = steps[i]
+        rows.append({
+            "session_id": session_id, "root": root, "kind": "step", "seq": i,
+            "timestamp": s.get("timestamp"), "event_type": s.get("event_type"),
+            "marco": s.get("marco"), "node": s.get("parent_node"), "state": None,
+            "author": None, "tipo": None, "content": _content(s.get("content")),
+        })
+    cursor["steps"] = len(steps)
+
+    for node, comments in (log.get("feedback") or {}).items():
+        start = cursor["feedback"].get(node, 0)
+        for i in range(start, len(comments)):
+            fb = comments[i]
+            rows.append({
+                "session_id": session_id, "root": root, "kind": "feedback", "seq": i,
+                "timestamp": fb.get("timestamp"), "event_type": "feedback", "marco": fb.get("marco"),
+                "node": node, "state": None, "author": fb.get("author"), "tipo": fb.get("tipo"),
+                "content": _content(fb.get("comment")),
+            })
+        cursor["feedback"][node] = len(comments)
+
+    for node, data in (log.get("node_states") or {}).items():
+        if cursor["states"].get(node) == data.get("timestamp"):
+            continue
+        rows.append({
+            "session_id": session_id, "root": root, "kind": "state", "seq": 0,
+            "timestamp": data.get("timestamp"), "event_type": "estado_modificado", "marco": data.get("marco"),
+            "node": node, "state": data.get("state"), "author": None, "tipo": None, "content": None,
+        })
+        cursor["states"][node] = data.get("timestamp")
+
+    return rows, cursor
+
+
+def _parse_ts(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _arrow_table(rows):
+    import pyarrow as pa
+
+    arrays = []
+    for name, kind in SCHEMA:
+        values = [r[name] for r in rows]
+        if kind == "dict":
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        elif kind == "int":
+            arrays.append(pa.array(values, type=pa.int32()))
+        elif kind == "timestamp":
+            arrays.append(pa.array([_parse_ts(v) for v in values], type=pa.timestamp("us")))
+        else:
+            arrays.append(pa.array(values, type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=COLUMNS)
+
+
+def has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def to_parquet_bytes(rows):
+    import pyarrow.parquet as pq
+
+    buf = io.BytesIO()
+    pq.write_table(_arrow_table(rows), buf, compression="zstd")
+    return buf.getvalue()
+
+
+def to_csv_bytes(rows):
+    """CSV de una sola sesión (sin diccionario aparte: las cadenas van en claro)."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+class ColumnarExporter:
+    """
+    Destino columnar con append incremental. `fmt` es "parquet", "csv" o
+    "auto" (Parquet si pyarrow está disponible, CSV compacto si no).
+    """
+
+    def __init__(self, path, fmt="auto", flush_rows=5000, flush_seconds=60, clock=time.time):
+        if fmt == "auto":
+            fmt = "parquet" if has_pyarrow() else "csv"
+        self.fmt = fmt
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.clock = clock
+        self.cursors = {}
+        self.owners = {}   # propietario (p. ej. slot de memoria) -> session_id actual
+        self.buffer = []
+        self._last_flush = clock()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def append_session(self, log, session_id, owner=None):
+        """
+        Añade al búfer las filas nuevas de la sesión desde el último append y
+        devuelve cuántas. Con `owner`, el cursor de la sesión anterior de ese
+        propietario (otra pregunta raíz) se descarta.
+        """
+        with self._lock:
+            if owner is not None:
+                previous = self.owners.get(owner)
+                if previous is not None and previous != session_id:
+                    self.cursors.pop(previous, None)
+                self.owners[owner] = session_id
+            rows, cursor = rows_since(log, session_id, self.cursors.get(session_id))
+            self.cursors[session_id] = cursor
+            self._buffer(rows)
+        return len(rows)
+
+    def append_rows(self, rows):
+        with self._lock:
+            self._buffer(rows)
+
+    def forget(self, owner):
+        """Descarta el cursor de la sesión de `owner` (reset o sesión olvidada)."""
+        with self._lock:
+            session_id = self.owners.pop(owner, None)
+            self.cursors.pop(session_id, None)
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _buffer(self, rows):
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.flush_rows or self.clock() - self._last_flush >= self.flush_seconds:
+            self._flush()
+
+    def _flush(self):
+        rows, self.buffer = self.buffer, []
+        self._last_flush = self.clock()
+        self._write(rows)
+
+    def _write(self, rows):
+        if not rows:
+            return
+        if self.fmt == "parquet":
+            self._append_parquet(rows)
+        else:
+            self._append_csv(rows)
+
+    def _append_parquet(self, rows):
+        import pyarrow.parquet as pq
+
+        os.makedirs(self.path, exist_ok=True)
+        name = f"part-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}.parquet"
+        pq.write_table(_arrow_table(rows), os.path.join(self.path, name), compression="zstd")
+
+    def _append_csv(self, rows):
+        dict_path = self.path + ".dict.json"
+        try:
+            with open(dict_path, "r", encoding="utf-8") as f:
+                dictionaries = json.load(f)
+        except (OSError, ValueError):
+            dictionaries = {}
+        index = {col: {v: i for i, v in enumerate(dictionaries.get(col, []))} for col in DICT_COLUMNS}
+
+        def code(col, value):
+            if value is None:
+                return ""
+            if value not in index[col]:
+                index[col][value] = len(index[col])
+                dictionaries.setdefault(col, []).append(value)
+            return index[col][value]
+
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if is_new:
+                writer.writerow(COLUMNS)
+            for r in rows:
+                writer.writerow([
+                    code(name, r[name]) if kind == "dict" else ("" if r[name] is None else r[name])
+                    for name, kind in SCHEMA
+                ])
+        with open(dict_path, "w", encoding="utf-8") as f:
+            json.dump(dictionaries, f, ensure_ascii=False)
+
+
+def read_compact_csv(path):
+    """Lee un CSV compacto y decodifica los diccionarios (para análisis sin pyarrow)."""
+    with open(path + ".dict.json", "r", encoding="utf-8") as f:
+        dictionaries = json.load(f)
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            for col in DICT_COLUMNS:
+                row[col] = dictionaries[col][int(row[col])] if row[col] != "" else None
+            row["seq"] = int(row["seq"])
+            yield row
+
+
+def main(argv=None):
+    from modules.batch_eee import iter_sessions
+
+    parser = argparse.ArgumentParser(description="Convierte razonamiento.json exportados a formato columnar.")
+    parser.add_argument("path", help="Directorio, .zip o .tar(.gz) con razonamiento.json exportados.")
+    parser.add_argument("--output", required=True, help="Directorio Parquet o fichero CSV de destino.")
+    parser.add_argument("--format", choices=["auto", "parquet", "csv"], default="auto")
+    parser.add_argument("--batch", type=int, default=50000, help="Filas por escritura.")
+    args = parser.parse_args(argv)
+
+    exporter = ColumnarExporter(args.output, fmt=args.format, flush_rows=args.batch, flush_seconds=float("inf"))
+    sessions = 0
+    for session_id, raw in iter_sessions(args.path):
+        try:
+            log = json.loads(raw)
+        except ValueError:
+            continue
+        rows, _ = rows_since(log, session_id)
+        exporter.append_rows(rows)
+        sessions += 1
+    exporter.flush()
+    print(f"{sessions} sesiones exportadas a {args.output} ({exporter.fmt})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
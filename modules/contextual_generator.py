@@ -1,16 +1,57 @@
 # modules/contextual_generator.py
 
-import os
 import json
-import openai
 
-# Configura tu clave de OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from modules.tracing import traced
+from modules.openai_client import get_openai
+from modules.dedup import merge_trees
 
-def generate_responses(tree: dict, mode: str) -> dict:
+def _node_responses(label: str, mode: str, chat_fn=None) -> list:
+    """Una llamada al modelo: tres respuestas argumentadas para la subpregunta `label`."""
+    # Construimos el prompt concatenando cadenas para evitar errores de comillas
+    prompt = (
+        "Eres un Generador Contextual de IA deliberativa.\n"
+        f"Nodo: '{label}'\n"
+        f"Modo de usuario: {mode}\n\n"
+        "Proporciona tres respuestas argumentadas:\n"
+        "1. Perspectiva ética.\n"
+        "2. Perspectiva histórica.\n"
+        "3. Perspectiva crítica.\n\n"
+        "Responde solo en formato JSON así:\n"
+        "{\n"
+        f'  "node": "{label}",\n'
+        "  \"responses\": [\n"
+        "    {\"label\": \"Ética\", \"text\": \"...\"},\n"
+        "    {\"label\": \"Histórica\", \"text\": \"...\"},\n"
+        "    {\"label\": \"Crítica\", \"text\": \"...\"}\n"
+        "  ]\n"
+        "}"
+    )
+
+    messages = [{"role": "system", "content": prompt}]
+    if chat_fn is not None:
+        resp = chat_fn(messages, max_tokens=600)
+    else:
+        # Llamada usando la API v1
+        resp = get_openai().chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=600,
+        )
+    try:
+        data = json.loads(resp.choices[0].message.content)
+    except (KeyError, json.JSONDecodeError):
+        data = {"responses": []}
+    return data.get("responses", [])
+
+
+@traced("contextual_generator.generate_responses")
+def generate_responses(tree: dict, mode: str, chat_fn=None) -> dict:
     """
     Recorre el árbol de indagación y genera respuestas desde
     tres marcos teóricos: ética, histórica y crítica.
+    Si se pasa chat_fn (p. ej. modules.fake_llm.FakeLLM) se usa en lugar de OpenAI.
     """
     responses = {}
 
@@ -23,41 +64,35 @@ def generate_responses(tree: dict, mode: str) -> dict:
         return responses
 
     def recurse(node):
-        # Construimos el prompt concatenando cadenas para evitar errores de comillas
-        prompt = (
-            "Eres un Generador Contextual de IA deliberativa.\n"
-            f"Nodo: '{node['node']}'\n"
-            f"Modo de usuario: {mode}\n\n"
-            "Proporciona tres respuestas argumentadas:\n"
-            "1. Perspectiva ética.\n"
-            "2. Perspectiva histórica.\n"
-            "3. Perspectiva crítica.\n\n"
-            "Responde solo en formato JSON así:\n"
-            "{\n"
-            f'  "node": "{node["node"]}",\n'
-            "  \"responses\": [\n"
-            "    {\"label\": \"Ética\", \"text\": \"...\"},\n"
-            "    {\"label\": \"Histórica\", \"text\": \"...\"},\n"
-            "    {\"label\": \"Crítica\", \"text\": \"...\"}\n"
-            "  ]\n"
-            "}"
-        )
-
-        # Llamada usando la API v1
-        resp = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "system", "content": prompt}],
-            temperature=0.7,
-            max_tokens=600,
-        )
-        try:
-            data = json.loads(resp.choices[0].message.content)
-        except (KeyError, json.JSONDecodeError):
-            data = {"responses": []}
-
-        responses[node["node"]] = data.get("responses", [])
+        responses[node["node"]] = _node_responses(node["node"], mode, chat_fn)
         for child in node.get("children", []):
             recurse(child)
 
     recurse(root)
     return responses
+
+
+@traced("contextual_generator.generate_shared_responses")
+def generate_shared_responses(trees: dict, mode: str, chat_fn=None, shared=None, known=None):
+    """
+    Genera las respuestas de varios árboles ({marco: árbol}) una sola vez por
+    nodo canónico (modules/dedup.py). `known` son respuestas ya obtenidas,
+    indexadas por etiqueta canónica, que tampoco se vuelven a pedir.
+
+    Devuelve (respuestas por etiqueta canónica, SharedGraph, informe); el informe
+    añade a SharedGraph.report() las llamadas realmente hechas y ahorradas.
+    """
+    shared = shared or merge_trees(trees)
+    known = known or {}
+    responses = {}
+    calls = 0
+    for cid in shared.present():
+        label = shared.label(cid)
+        if known.get(label):
+            responses[label] = known[label]
+            continue
+        responses[label] = _node_responses(label, mode, chat_fn)
+        calls += 1
+    report = dict(shared.report(), llamadas_realizadas=calls)
+    report["llamadas_ahorradas"] = shared.total_nodes - calls
+    return responses, shared, report
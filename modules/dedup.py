@@ -0,0 +1,199 @@
+# modules/dedup.py
+"""
+Fusión de los árboles de PERSPECTIVES en un grafo compartido con nodos
+canónicos: las subpreguntas idénticas o casi idénticas entre marcos se
+unifican para generar sus respuestas una sola vez y para que estados y
+feedback no se fragmenten entre duplicados.
+"""
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+_PUNCT = re.compile(r"[^\w\s]")
+_NUMBERING = re.compile(r"^\s*(\d+[.)]\s*)+")
+_DIGITS = re.compile(r"\d+")
+STOPWORDS = {"el", "la", "los", "las", "de", "del", "en", "y", "a", "que", "un", "una", "por", "para", "se", "es", "o"}
+# Palabras y prefijos que invierten el sentido: «ético» / «no ético», «legal» / «ilegal»
+NEGATIONS = {"no", "ni", "nunca", "jamas", "sin", "tampoco", "nadie", "nada", "ningun", "ninguna", "ninguno"}
+NEGATING_PREFIXES = ("des", "dis", "in", "im", "ir", "i", "anti", "contra", "a")
+
+
+def normalize(label):
+    """Minúsculas, sin tildes, sin numeración inicial ni signos de puntuación."""
+    text = unicodedata.normalize("NFKD", _NUMBERING.sub("", str(label)).casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_PUNCT.sub(" ", text).split())
+
+
+def opposite(a, b):
+    """
+    ¿Difieren dos etiquetas normalizadas en polaridad? Sí si solo una contiene
+    una negación, o si una palabra de una es la de la otra con un prefijo
+    negativo («ventajas» / «desventajas», «legal» / «ilegal»).
+    """
+    ta, tb = set(a.split()), set(b.split())
+    if (ta & NEGATIONS) != (tb & NEGATIONS):
+        return True
+    for x in ta - tb:
+        for y in tb - ta:
+            longer, shorter = (x, y) if len(x) > len(y) else (y, x)
+            prefix = longer[: len(longer) - len(shorter)]
+            if longer.endswith(shorter) and prefix in NEGATING_PREFIXES:
+                return True
+    return False
+
+
+def similarity(a, b, threshold=0.0):
+    """
+    Similitud entre dos etiquetas ya normalizadas (0–1). Devuelve 0 en cuanto
+    una cota superior barata queda por debajo de `threshold`, si difieren en
+    alguna cifra (fechas y cantidades distintas no son la misma pregunta) o si
+    una es la negación de la otra.
+    """
+    if a == b:
+        return 1.0
+    if set(_DIGITS.findall(a)) != set(_DIGITS.findall(b)):
+        return 0.0
+    if opposite(a, b):
+        return 0.0
+    matcher = SequenceMatcher(None, a, b)
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return 0.0
+    return matcher.ratio()
+
+
+class SharedGraph:
+    """
+    Grafo de nodos canónicos. `canonical[cid]` guarda la etiqueta elegida, los
+    miembros (marco, etiqueta original) y las aristas hacia nodos canónicos hijos.
+    """
+
+    def __init__(self):
+        self.canonical = {}
+        self.alias = {}          # etiqueta original -> id canónico
+        self.by_norm = {}        # etiqueta normalizada -> id canónico
+        self.total_nodes = 0
+
+    def label(self, cid):
+        return self.canonical[cid]["label"]
+
+    def canonical_label(self, label):
+        """Etiqueta canónica de una subpregunta (la propia si no tiene duplicados)."""
+        cid = self.alias.get(label)
+        if cid is None:
+            cid = self.by_norm.get(normalize(label))
+        return self.label(cid) if cid is not None else label
+
+    def group(self, label):
+        """Etiquetas originales unificadas con `label` (incluida la canónica)."""
+        cid = self.alias.get(label)
+        if cid is None:
+            cid = self.by_norm.get(normalize(label))
+        if cid is None:
+            return [label]
+        return [self.label(cid)] + [original for _, original in self.canonical[cid]["members"]]
+
+    def present(self):
+        """Ids canónicos con algún miembro en los árboles (sin semillas fijadas ausentes)."""
+        return [cid for cid, c in self.canonical.items() if c["members"]]
+
+    def aliases(self):
+        """{etiqueta original: etiqueta canónica} solo para las que difieren."""
+        return {
+            original: self.label(cid)
+            for original, cid in self.alias.items()
+            if original != self.label(cid)
+        }
+
+    def shared_nodes(self):
+        """Nodos canónicos presentes en más de un marco."""
+        return [
+            c for c in self.canonical.values()
+            if len({marco for marco, _ in c["members"]}) > 1
+        ]
+
+    def report(self):
+        canonical = len(self.present())
+        return {
+            "nodos_originales": self.total_nodes,
+            "nodos_canonicos": canonical,
+            "llamadas_ahorradas": self.total_nodes - canonical,
+            "compartidos_entre_marcos": len(self.shared_nodes()),
+        }
+
+
+def merge_trees(trees, threshold=0.88, pinned=None):
+    """
+    Unifica {marco: árbol} en un SharedGraph. Las coincidencias exactas (tras
+    normalizar) se resuelven por diccionario; las aproximadas solo se comparan
+    con candidatos que comparten al menos la mitad de las palabras
+    significativas (índice invertido).
+
+    `pinned` ({etiqueta: canónica}) fija canónicas ya usadas para guardar estado o
+    feedback: se siembran antes de recorrer los árboles, así que no dependen del
+    orden de inserción ni cambian al injertar o precargar más árboles.
+    """
+    graph = SharedGraph()
+    by_norm = graph.by_norm
+    index = {}
+
+    def new_canonical(label, norm, tokens):
+        cid = len(graph.canonical)
+        graph.canonical[cid] = {"label": label, "norm": norm, "members": [], "children": set()}
+        for t in tokens:
+            index.setdefault(t, []).append(cid)
+        by_norm[norm] = cid
+        return cid
+
+    def tokens_for(norm):
+        # Las cifras forman parte de la clave: solo se comparan etiquetas con las mismas
+        digits = frozenset(_DIGITS.findall(norm))
+        return {(digits, t) for t in norm.split() if t not in STOPWORDS}
+
+    for label, canonical in (pinned or {}).items():
+        cid = by_norm.get(normalize(canonical))
+        if cid is None:
+            cid = new_canonical(canonical, normalize(canonical), tokens_for(normalize(canonical)))
+        graph.alias[canonical] = cid
+        graph.alias[label] = cid
+        by_norm.setdefault(normalize(label), cid)
+
+    def canonical_for(label, marco):
+        norm = normalize(label)
+        cid = graph.alias.get(label, by_norm.get(norm))
+        if cid is None:
+            tokens = tokens_for(norm)
+            shared = {}
+            for t in tokens:
+                for cand in index.get(t, ()):
+                    shared[cand] = shared.get(cand, 0) + 1
+            needed = max(1, len(tokens) // 2)
+            best, best_score = None, threshold
+            for cand, count in shared.items():
+                if count < needed:
+                    continue
+                score = similarity(norm, graph.canonical[cand]["norm"], threshold)
+                if score >= best_score:
+                    best, best_score = cand, score
+            cid = best
+            if cid is None:
+                cid = new_canonical(label, norm, tokens)
+            by_norm[norm] = cid
+        graph.canonical[cid]["members"].append((marco, label))
+        graph.alias.setdefault(label, cid)
+        return cid
+
+    for marco, tree in trees.items():
+        if not isinstance(tree, dict):
+            continue
+        stack = [(tree, None)]
+        while stack:
+            node, parent = stack.pop()
+            graph.total_nodes += 1
+            cid = canonical_for(node.get("node", "<sin etiqueta>"), marco)
+            if parent is not None and parent != cid:
+                graph.canonical[parent]["children"].add(cid)
+            for child in node.get("children", []):
+                stack.append((child, cid))
+    return graph
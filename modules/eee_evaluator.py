@@ -1,6 +1,9 @@
 import json
-from statistics import mean
+from statistics import mean, fmean
 
+from modules.tracing import traced
+
+@traced("eee_evaluator.calculate_eee")
 def calculate_eee(tracker) -> float:
     """
     Calcula el Índice de Equilibrio Erotético (EEE) a partir de los datos
@@ -29,3 +32,52 @@ def calculate_eee(tracker) -> float:
     
     # EEE es la media de las tres dimensiones
     return mean([d_norm, p_norm, r_norm])
+
+
+@traced("eee_evaluator.calcular_eee")
+def calcular_eee(tracker, profundidad=None) -> dict:
+    """
+    Calcula el EEE de cinco dimensiones que muestra el dashboard epistémico,
+    junto con los valores brutos que lo alimentan. Si se pasa `profundidad`
+    (p. ej. la que mantiene TreeGraph) no se recorre el árbol.
+    """
+    log = tracker.log
+    root = log.get("inquiry", {})
+    steps = log.get("steps", [])
+    node_states = log.get("node_states", {})
+
+    def depth(n):
+        if not n or not isinstance(n, dict):
+            return 0
+        return 1 + max([depth(child) for child in n.get("children", [])] or [0])
+    if profundidad is None:
+        profundidad = depth(root) if root else 0
+    norm_prof = min(profundidad / 6, 1)
+
+    resp = log.get("responses", {})
+    pluralidad = fmean([len(lst) for lst in resp.values()]) if resp else 0
+    norm_plur = min(pluralidad / 3, 1)
+
+    trazabilidad = len(steps)
+    norm_traz = min(trazabilidad / 12, 1)
+
+    cambios_estado = sum([1 for s in steps if s["event_type"] in ["estado_modificado", "reformulacion"]])
+    norm_rev = min((cambios_estado + 1) / (profundidad + 1), 1) if profundidad else 0
+
+    disputas = sum(1 for v in node_states.values() if v.get("state") == "En disputa")
+    total_nodos = len(node_states) if node_states else 1
+    norm_rob = min(disputas / total_nodos, 1) if total_nodos else 0
+
+    eee = round(fmean([norm_prof, norm_plur, norm_traz, norm_rev, norm_rob]), 3)
+
+    return {
+        "EEE Global": eee,
+        "Profundidad estructural": round(norm_prof, 2),
+        "Pluralidad semántica": round(norm_plur, 2),
+        "Trazabilidad razonadora": round(norm_traz, 2),
+        "Reversibilidad efectiva": round(norm_rev, 2),
+        "Robustez ante disenso": round(norm_rob, 2),
+        "Profundidad bruta": profundidad,
+        "Pasos razonamiento": trazabilidad,
+        "Nodos en disputa": disputas
+    }
@@ -0,0 +1,122 @@
+# modules/fake_llm.py
+
+import os
+import json
+import time
+import random
+import re
+from types import SimpleNamespace
+
+
+class FakeLLMError(RuntimeError):
+    """Error simulado por el backend falso (equivalente a un fallo de la API)."""
+
+
+class FakeLLM:
+    """
+    Backend de LLM determinista para pruebas de carga y benchmarks.
+
+    Imita la firma de ``chat(messages, max_tokens)`` usada en app.py y la de
+    ``openai.chat.completions.create`` y devuelve JSON válido según el tipo de
+    prompt (árbol, expansión de un nodo, reformulaciones o respuestas multiperspectiva),
+    sin red ni coste.
+
+    - latency / jitter: segundos de espera base y variación máxima (uniforme ±jitter).
+    - error_rate: probabilidad de lanzar FakeLLMError.
+    - malformed_rate: probabilidad de devolver contenido que no es JSON.
+    - branching / depth: forma de los árboles generados (10 y 3 ≈ 1.1k nodos).
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, malformed_rate=0.0,
+                 branching=4, depth=2, seed=0, sleep=time.sleep):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.branching = branching
+        self.depth = depth
+        self.sleep = sleep
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @classmethod
+    def from_env(cls):
+        """Construye el backend a partir de variables FAKE_LLM_* del entorno."""
+        return cls(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0")),
+            jitter=float(os.getenv("FAKE_LLM_JITTER", "0")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            malformed_rate=float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0")),
+            branching=int(os.getenv("FAKE_LLM_BRANCHING", "4")),
+            depth=int(os.getenv("FAKE_LLM_DEPTH", "2")),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+        )
+
+    def __call__(self, messages, max_tokens=500):
+        return self.create(model="fake", messages=messages, max_tokens=max_tokens)
+
+    def create(self, model=None, messages=None, temperature=None, max_tokens=500, **kwargs):
+        self.calls += 1
+        prompt = "\n".join(m.get("content", "") for m in (messages or []))
+
+        delay = self.latency
+        if self.jitter:
+            delay += self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            self.sleep(delay)
+
+        if self.rng.random() < self.error_rate:
+            raise FakeLLMError(f"Fallo simulado en la llamada {self.calls}")
+        if self.rng.random() < self.malformed_rate:
+            content = "Lo siento, no puedo responder en JSON."
+        else:
+            content = json.dumps(self._payload(prompt), ensure_ascii=False)
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=len(prompt) // 4,
+                completion_tokens=len(content) // 4,
+                total_tokens=(len(prompt) + len(content)) // 4,
+            ),
+        )
+
+    # ---- Generación de contenido según el tipo de prompt ----
+    def _payload(self, prompt):
+        if "Generador Contextual" in prompt:
+            match = re.search(r"Nodo: '(.*)'", prompt)
+            node = match.group(1) if match else "<nodo>"
+            return {"node": node, "responses": self._responses(["Ética", "Histórica", "Crítica"], node)}
+        if "Analiza la siguiente cuestión desde tres perspectivas" in prompt:
+            match = re.search(r"Subpregunta: “(.*)”", prompt)
+            node = match.group(1) if match else "<nodo>"
+            return self._responses(["Ética", "Histórico-Social", "Epistemológica"], node)
+        if "Subpregunta a desarrollar" in prompt:
+            match = re.search(r"Subpregunta a desarrollar: '(.*)'", prompt)
+            node = match.group(1) if match else "<nodo>"
+            return [
+                {"node": f"{node} › hija {i} (#{self.rng.randint(0, 9999)})", "children": []}
+                for i in range(1, self.branching + 1)
+            ]
+        if "Motor de Diálogo Adaptativo" in prompt:
+            return [{"original": "Pregunta raíz", "suggestions": ["Reformulación A", "Reformulación B"]}]
+        match = re.search(r"Pregunta raíz: [“'](.*)[”']", prompt)
+        root = match.group(1) if match else "Pregunta raíz"
+        return self._tree(root, self.depth, "")
+
+    def _tree(self, label, depth, prefix):
+        node = {"node": label, "children": []}
+        if depth > 0:
+            for i in range(1, self.branching + 1):
+                path = f"{prefix}{i}"
+                node["children"].append(
+                    self._tree(f"Subpregunta {path} (#{self.rng.randint(0, 9999)})", depth - 1, path + ".")
+                )
+        return node
+
+    def _responses(self, labels, node):
+        return [
+            {"label": label, "text": f"Argumento {label.lower()} sobre «{node}» ({self.rng.randint(0, 9999)})."}
+            for label in labels
+        ]
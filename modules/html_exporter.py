@@ -1,4 +1,58 @@
 import json
+from html import escape
+
+from modules.tracing import traced
+from modules.step_index import step_row
+
+# Filas visibles por página en la tabla de pasos del informe
+STEPS_PAGE_SIZE = 50
+
+# La tabla de pasos se pinta en el navegador por páginas a partir de un JSON
+# embebido: el DOM solo contiene la página visible, no todas las filas.
+STEPS_SCRIPT = """
+<script>
+(function () {
+  var rows = JSON.parse(document.getElementById('steps-data').textContent);
+  var pageSize = %(page_size)d, page = 1, filtered = rows;
+  var body = document.getElementById('steps-body');
+  var info = document.getElementById('steps-info');
+  var tipo = document.getElementById('f-tipo'), marco = document.getElementById('f-marco');
+  var nodo = document.getElementById('f-nodo');
+  function fill(select, col) {
+    var seen = {};
+    rows.forEach(function (r) { if (r[col]) seen[r[col]] = true; });
+    Object.keys(seen).sort().forEach(function (v) {
+      var o = document.createElement('option'); o.value = v; o.textContent = v; select.appendChild(o);
+    });
+  }
+  function render() {
+    var pages = Math.max(1, Math.ceil(filtered.length / pageSize));
+    page = Math.min(Math.max(1, page), pages);
+    body.innerHTML = '';
+    filtered.slice((page - 1) * pageSize, page * pageSize).forEach(function (r) {
+      var tr = document.createElement('tr');
+      r.forEach(function (cell) {
+        var td = document.createElement('td'); td.textContent = cell; tr.appendChild(td);
+      });
+      body.appendChild(tr);
+    });
+    info.textContent = filtered.length + ' pasos · página ' + page + ' de ' + pages;
+  }
+  function apply() {
+    var t = tipo.value, m = marco.value, n = nodo.value.toLowerCase();
+    filtered = rows.filter(function (r) {
+      return (!t || r[1] === t) && (!m || r[3] === m) && (!n || r[4].toLowerCase().indexOf(n) >= 0);
+    });
+    page = 1; render();
+  }
+  fill(tipo, 1); fill(marco, 3);
+  tipo.onchange = apply; marco.onchange = apply; nodo.oninput = apply;
+  document.getElementById('steps-prev').onclick = function () { page--; render(); };
+  document.getElementById('steps-next').onclick = function () { page++; render(); };
+  render();
+})();
+</script>
+"""
 
 def render_html_tree(node):
     if node is None:
@@ -13,6 +67,7 @@ def render_html_tree(node):
     html += "</li>"
     return html
 
+@traced("html_exporter.generate_html_report")
 def generate_html_report(reasoning_log):
     inquiry = reasoning_log.get('inquiry', None)
     if inquiry:
@@ -36,6 +91,8 @@ def generate_html_report(reasoning_log):
       .step-table {{ border-collapse: collapse; width: 98%; }}
       .step-table th, .step-table td {{ border: 1px solid #bbb; padding: 7px 12px; text-align: left; }}
       .step-table th {{ background: #e5e9f5; }}
+      .step-controls {{ margin-bottom: 0.8em; }}
+      .step-controls select, .step-controls input, .step-controls button {{ margin-right: 0.6em; }}
     </style>
     </head>
     <body>
@@ -53,29 +110,34 @@ def generate_html_report(reasoning_log):
     </div>
     <div class='block'>
       <h2>3. Pasos, Selecciones y Justificaciones</h2>
+      <div class='step-controls'>
+        <select id='f-tipo'><option value=''>Todos los tipos</option></select>
+        <select id='f-marco'><option value=''>Todos los marcos</option></select>
+        <input id='f-nodo' placeholder='Filtrar por subpregunta'/>
+        <button id='steps-prev'>&laquo;</button><button id='steps-next'>&raquo;</button>
+        <span id='steps-info'></span>
+      </div>
       <table class='step-table'>
-        <tr>
+        <thead><tr>
           <th>Momento</th>
           <th>Tipo de Acción</th>
           <th>Contenido / Resumen</th>
           <th>Marco</th>
           <th>Subpregunta/Nodo</th>
-        </tr>
+        </tr></thead>
+        <tbody id='steps-body'></tbody>
+      </table>
     """
-    for step in reasoning_log.get("steps", []):
-        html += "<tr>"
-        html += f"<td>{step.get('timestamp','')}</td>"
-        html += f"<td>{step.get('event_type','')}</td>"
-        cont = step.get('content','')
-        if isinstance(cont, dict):
-            cont = json.dumps(cont, ensure_ascii=False)
-        elif isinstance(cont, list):
-            cont = "; ".join(str(x) for x in cont)
-        html += f"<td>{str(cont)[:400]}{'...' if len(str(cont)) > 400 else ''}</td>"
-        html += f"<td>{step.get('marco','')}</td>"
-        html += f"<td>{step.get('parent_node','')}</td>"
-        html += "</tr>"
-    html += "</table></div>"
+    rows = [list(step_row(step).values()) for step in reasoning_log.get("steps", [])]
+    # "</" escapado para que ningún contenido pueda cerrar la etiqueta <script>
+    data = json.dumps(rows, ensure_ascii=False).replace("</", "<\\/")
+    html += f"<script type='application/json' id='steps-data'>{data}</script>"
+    html += "<noscript><table class='step-table'>"
+    for row in rows[:STEPS_PAGE_SIZE]:
+        html += "<tr>" + "".join(f"<td>{escape(str(cell))}</td>" for cell in row) + "</tr>"
+    html += f"</table><p>Mostrando {min(len(rows), STEPS_PAGE_SIZE)} de {len(rows)} pasos.</p></noscript>"
+    html += STEPS_SCRIPT % {"page_size": STEPS_PAGE_SIZE}
+    html += "</div>"
 
     html += "<div class='block'><h2>4. Respuestas Multiperspectiva Registradas</h2>"
     respuestas = reasoning_log.get("responses", {})
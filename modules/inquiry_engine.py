@@ -1,11 +1,9 @@
 # modules/inquiry_engine.py
 
-import os
 import json
-import openai
 
-# Configura tu clave de OpenAI desde la variable de entorno
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from modules.tracing import traced
+from modules.openai_client import get_openai
 
 # Prompt para generar subpreguntas jerárquicas
 INQUIRY_PROMPT = """
@@ -18,8 +16,9 @@ Nivel de usuario: {mode}
 Responde **solo** en formato JSON.
 """
 
+@traced("inquiry_engine.generate_inquiry_tree")
 def generate_inquiry_tree(root_question: str, mode: str) -> dict:
-    response = openai.chat.completions.create(
+    response = get_openai().chat.completions.create(
         model="gpt-3.5-turbo",
         messages=[{
             "role": "system",
@@ -30,3 +29,60 @@ def generate_inquiry_tree(root_question: str, mode: str) -> dict:
     )
     content = response.choices[0].message.content
     return json.loads(content)
+
+# Prompt para desarrollar un único nodo del árbol (solo sus hijos directos)
+EXPAND_PROMPT = """
+Eres un generador de subpreguntas para fomentar el pensamiento crítico.
+Pregunta raíz: '{question}'
+Ruta hasta la subpregunta: {ancestry}
+Subpregunta a desarrollar: '{node}'
+Subpreguntas hijas ya existentes (no las repitas): {existing}
+Nivel de usuario: {mode}
+
+1. Propón 2–4 subpreguntas hijas de la subpregunta a desarrollar.
+2. No desarrolles más niveles.
+Responde **solo** en formato JSON así:
+[{{"node": "Subpregunta hija", "children": []}}]
+"""
+
+@traced("inquiry_engine.expand_node")
+def expand_node(tree: dict, path: tuple, root_question: str, mode: str, chat_fn=None) -> list:
+    """
+    Pide al modelo solo los hijos del nodo en `path` (índices de hijos desde la raíz)
+    y devuelve la lista de nuevos hijos. No modifica el árbol: el injerto lo hace
+    quien llama (p. ej. TreeGraph.graft) para mantener sus cachés al día.
+    """
+    ancestry, node = [], tree
+    for i in path:
+        ancestry.append(node.get("node", ""))
+        node = node["children"][i]
+    prompt = EXPAND_PROMPT.format(
+        question=root_question,
+        ancestry=" > ".join(ancestry) or "(raíz)",
+        node=node.get("node", ""),
+        existing=json.dumps([c.get("node", "") for c in node.get("children", [])], ensure_ascii=False),
+        mode=mode,
+    )
+    messages = [{"role": "system", "content": prompt}]
+    if chat_fn is not None:
+        response = chat_fn(messages, max_tokens=250)
+    else:
+        response = get_openai().chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=250,
+        )
+    try:
+        data = json.loads(response.choices[0].message.content)
+    except (TypeError, json.JSONDecodeError):
+        return []
+    if isinstance(data, dict):
+        data = data.get("children", [])
+    children = []
+    for item in data if isinstance(data, list) else []:
+        if isinstance(item, str):
+            children.append({"node": item, "children": []})
+        elif isinstance(item, dict) and item.get("node"):
+            children.append({"node": item["node"], "children": []})
+    return children
@@ -0,0 +1,191 @@
+# modules/live_sync.py
+"""
+Canal compartido de feedback y estados epistémicos entre sesiones que trabajan
+sobre la misma pregunta raíz (pares y docente).
+
+Es un pub/sub sobre una tabla SQLite local: cada add_feedback / set_node_state
+se publica como un evento con id creciente, y cada sesión lee solo los eventos
+posteriores a su cursor. Varios procesos de Streamlit pueden compartir el mismo
+fichero (modo WAL).
+
+- Solo se comparte dentro de una sala explícita: código de clase + pregunta raíz.
+- Lo recibido se guarda aparte (new_remote(), en el slot de la sesión), nunca en
+  el ReasoningTracker: el EEE, el informe y la exportación solo cuentan lo que
+  hizo la propia sesión.
+- Un suscriptor nuevo empieza por los eventos de las últimas `history_seconds`,
+  y el canal borra los eventos con más de `retention_seconds`.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from modules.dedup import normalize
+from modules.tracing import traced
+
+FEEDBACK = "feedback"
+STATE = "state"
+
+
+def room_for(code, root_question):
+    """
+    Sala de un código de clase y una pregunta raíz (misma pregunta salvo
+    mayúsculas, tildes o signos). Sin código no hay sala: None.
+    """
+    code = normalize(code or "")
+    if not code:
+        return None
+    return f"{code}::{normalize(root_question)}"
+
+
+def _timestamp(seconds_ago=0):
+    return (datetime.utcnow() - timedelta(seconds=seconds_ago)).isoformat()
+
+
+def new_remote():
+    """Almacén de lo recibido de otras sesiones: feedback por nodo y último estado por nodo."""
+    return {"feedback": {}, "node_states": {}}
+
+
+def merged_states(local, remote):
+    """Estados de `local` (del tracker) combinados con los remotos: gana el más reciente."""
+    merged = dict(local)
+    for node, entry in remote["node_states"].items():
+        mine = merged.get(node)
+        if mine is None or mine.get("timestamp", "") < entry.get("timestamp", ""):
+            merged[node] = entry
+    return merged
+
+
+def merged_feedback(local, remote, node):
+    """Comentarios propios y remotos de `node`, por orden de llegada."""
+    entries = list(local.get(node, [])) + remote["feedback"].get(node, [])
+    return sorted(entries, key=lambda e: e.get("timestamp", ""))
+
+
+class FeedbackChannel:
+    """Registro de eventos compartido, indexado por (sala, id) y con retención por antigüedad."""
+
+    def __init__(self, path="live_sync.db", retention_seconds=24 * 3600, prune_every=200):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.prune_every = prune_every
+        self._published = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " room TEXT NOT NULL, kind TEXT NOT NULL, node TEXT NOT NULL,"
+                " payload TEXT NOT NULL, origin TEXT, created TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_room_id ON events (room, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS events_created ON events (created)")
+        self.prune()
+
+    @traced("live_sync.publish")
+    def publish(self, room, kind, node, payload, origin=None):
+        """Publica un evento y devuelve su id."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO events (room, kind, node, payload, origin, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (room, kind, node, json.dumps(payload, ensure_ascii=False), origin, _timestamp()),
+            )
+            event_id = cur.lastrowid
+            self._published += 1
+            due = self._published % self.prune_every == 0
+        if due:
+            self.prune()
+        return event_id
+
+    @traced("live_sync.prune")
+    def prune(self):
+        """Borra los eventos más antiguos que `retention_seconds`. Devuelve cuántos."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "DELETE FROM events WHERE created < ?", (_timestamp(self.retention_seconds),)
+            )
+            return cur.rowcount
+
+    @traced("live_sync.poll")
+    def poll(self, room, after=0, limit=500):
+        """Eventos de `room` con id > `after`, en orden: [(id, kind, node, payload, origin)]."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, node, payload, origin FROM events"
+                " WHERE room = ? AND id > ? ORDER BY id LIMIT ?",
+                (room, after, limit),
+            ).fetchall()
+        return [(i, kind, node, json.loads(payload), origin) for i, kind, node, payload, origin in rows]
+
+    def last_id(self, room):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(id) FROM events WHERE room = ?", (room,)).fetchone()
+        return row[0] or 0
+
+    def start_id(self, room, history_seconds):
+        """Cursor inicial de un suscriptor nuevo: justo antes del primer evento reciente de la sala."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(id) FROM events WHERE room = ? AND created >= ?",
+                (room, _timestamp(history_seconds)),
+            ).fetchone()
+        if row[0] is None:
+            return self.last_id(room)
+        return row[0] - 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LiveSync:
+    """
+    Suscripción de una sesión a una sala. Guarda solo el cursor del último
+    evento aplicado y su propio id para no reaplicar lo que ella publica; lo
+    recibido va al almacén `remote` que le pasa quien llama.
+    """
+
+    def __init__(self, channel, room, session_id, history_seconds=2 * 3600):
+        self.channel = channel
+        self.room = room
+        self.session_id = session_id
+        self.cursor = channel.start_id(room, history_seconds)
+        self.received = 0
+
+    def publish_feedback(self, node, entry):
+        self.channel.publish(self.room, FEEDBACK, node, entry, origin=self.session_id)
+
+    def publish_state(self, node, entry):
+        self.channel.publish(self.room, STATE, node, entry, origin=self.session_id)
+
+    def apply(self, remote, resolve=None):
+        """
+        Incorpora a `remote` (ver new_remote) los eventos nuevos de otras sesiones. `resolve` traduce la
+        etiqueta remota a la local (p. ej. a su nodo canónico). Devuelve los nodos tocados.
+        """
+        changed = set()
+        while True:
+            events = self.channel.poll(self.room, self.cursor)
+            if not events:
+                break
+            for event_id, kind, node, payload, origin in events:
+                self.cursor = event_id
+                if origin == self.session_id:
+                    continue
+                node = resolve(node) if resolve else node
+                if kind == FEEDBACK:
+                    remote["feedback"].setdefault(node, []).append(payload)
+                elif kind == STATE:
+                    known = remote["node_states"].get(node)
+                    if known is not None and known.get("timestamp", "") >= payload.get("timestamp", ""):
+                        continue
+                    remote["node_states"][node] = payload
+                else:
+                    continue
+                changed.add(node)
+                self.received += 1
+        return changed
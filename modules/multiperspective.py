@@ -0,0 +1,227 @@
+# modules/multiperspective.py
+
+import json
+import contextvars
+
+from modules.tracing import traced
+from modules.token_budget import trim_tree
+
+# ---- Marcos multiperspectiva ----
+PERSPECTIVES = {
+    "Ética": "Desde una perspectiva ética (deontología, utilitarismo, ética del cuidado)...",
+    "Histórico-Social": "Desde una perspectiva histórica o sociopolítica relevante...",
+    "Epistemológica": "Desde una perspectiva crítica epistemológica o filosófica..."
+}
+
+STATE_COLORS = {
+    "Abierta": "limegreen",
+    "Resuelta": "deepskyblue",
+    "En disputa": "orange",
+    "Suspendida": "gray"
+}
+
+STATE_EMOJIS = {
+    "Abierta": "🟢",
+    "Resuelta": "🔵",
+    "En disputa": "🟠",
+    "Suspendida": "⚪"
+}
+
+
+def count_nodes(tree):
+    if not tree or not isinstance(tree, dict):
+        return 0
+    return 1 + sum([count_nodes(child) for child in tree.get("children", [])])
+
+
+@traced("multiperspective.generate_tree")
+def generate_tree(root_question, marco, chat_fn):
+    """Genera el árbol de subpreguntas de un único marco de PERSPECTIVES."""
+    prompt = (
+        f"{PERSPECTIVES[marco]}\n"
+        f"Pregunta raíz: “{root_question}”\n"
+        "1. Identifica 3–5 subpreguntas necesarias para el análisis crítico.\n"
+        "2. Organízalas en estructura jerárquica.\n"
+        "Devuelve solo JSON: {{ 'node': '...', 'children': [ ... ] }}"
+    )
+    resp = chat_fn([{"role": "system", "content": prompt}], max_tokens=600)
+    try:
+        return json.loads(resp.choices[0].message.content)
+    except Exception:
+        return {"node": "Error al generar", "children": []}
+
+
+@traced("multiperspective.generate_trees")
+def generate_trees(root_question, chat_fn):
+    """Genera un árbol de subpreguntas por cada marco de PERSPECTIVES."""
+    return {marco: generate_tree(root_question, marco, chat_fn) for marco in PERSPECTIVES}
+
+
+def prefetch_trees(root_question, marcos, chat_fn, executor):
+    """
+    Lanza en segundo plano la generación de los árboles de `marcos`.
+    Devuelve {marco: Future}; cada tarea conserva el contexto (tracer activo).
+    """
+    return {
+        marco: executor.submit(contextvars.copy_context().run, generate_tree, root_question, marco, chat_fn)
+        for marco in marcos
+    }
+
+
+@traced("multiperspective.sugerir_reformulaciones")
+def sugerir_reformulaciones(root_question, tree, perfil, chat_fn, max_context_tokens=None):
+    """Sugiere reformulaciones; si max_context_tokens se indica, el árbol se recorta por niveles."""
+    if max_context_tokens:
+        tree = trim_tree(tree, max_context_tokens)
+    prompt = (
+        "Eres un Motor de Diálogo Adaptativo.\n"
+        f"Árbol (JSON): {json.dumps(tree, ensure_ascii=False)}\n"
+        f"Perfil: {perfil}\n\n"
+        "Si hay ambigüedad o margen de mejora, sugiere hasta 2 reformulaciones de la pregunta raíz.\n"
+        "Responde solo con JSON de lista:\n"
+        '[{"original":"…","suggestions":["…","…"]},…]'
+    )
+    r = chat_fn([{"role": "system", "content": prompt}], max_tokens=300)
+    try:
+        focus_suggestions = json.loads(r.choices[0].message.content)
+    except Exception:
+        focus_suggestions = []
+    return focus_suggestions
+
+
+@traced("multiperspective.generar_respuestas_multiperspectiva")
+def generar_respuestas_multiperspectiva(nodo, marco, chat_fn):
+    prompt = (
+        f"Analiza la siguiente cuestión desde tres perspectivas.\n"
+        f"Subpregunta: “{nodo}”\n"
+        f"Marco seleccionado: {marco}\n"
+        "Proporciona tres respuestas bien argumentadas y diferenciadas:\n"
+        "1. Perspectiva ética (deontología, utilitarismo, ética del cuidado).\n"
+        "2. Perspectiva histórico-sociopolítica relevante.\n"
+        "3. Perspectiva crítica epistemológica o filosófica.\n"
+        "Responde solo en JSON:\n"
+        '[{"label": "Ética", "text": "..."}, {"label": "Histórico-Social", "text": "..."}, {"label": "Epistemológica", "text": "..."}]'
+    )
+    r = chat_fn([{"role": "system", "content": prompt}], max_tokens=700)
+    try:
+        data = json.loads(r.choices[0].message.content)
+    except Exception:
+        data = []
+    return data
+
+
+# ---- Grafo DOT coloreado por estado epistémico ----
+def build_dot(node, node_states):
+    node_name = node.get("node", "<sin etiqueta>")
+    node_state = node_states.get(node_name, {}).get("state", "Abierta")
+    color = STATE_COLORS.get(node_state, "black")
+    emoji = STATE_EMOJIS.get(node_state, "🟢")
+    label = f"{emoji} {node_name}"
+
+    dot = f'"{label}" [style=filled, fillcolor={color}, shape=box, fontname="Arial", fontsize=14];\n'
+    for child in node.get("children", []):
+        c_label = child.get("node", "<sin etiqueta>")
+        child_state = node_states.get(c_label, {}).get("state", "Abierta")
+        c_emoji = STATE_EMOJIS.get(child_state, "🟢")
+        c_label_full = f"{c_emoji} {c_label}"
+        dot += f'"{label}" -> "{c_label_full}";\n'
+        dot += build_dot(child, node_states)
+    return dot
+
+
+@traced("multiperspective.build_graph")
+def build_graph(root, node_states):
+    """Devuelve el digraph completo listo para st.graphviz_chart."""
+    return f'digraph G {{\nrankdir=TB;\nnode [style=filled, fontname="Arial"];\n{build_dot(root, node_states)}}}'
+
+
+class TreeGraph:
+    """
+    Árbol de un marco con su DOT cacheado línea a línea. Solo se recalculan las
+    líneas de los nodos cuyo estado cambia, y graft() añade las de los hijos
+    injertados sin recorrer el resto del árbol. También mantiene la profundidad.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.paths = []   # rutas (tuplas de índices de hijos) en orden de recorrido
+        self.nodes = {}   # ruta -> nodo
+        self.depth = 0
+        self.aliases = {}  # etiqueta -> etiqueta canónica (modules/dedup.py)
+        self._lines = {}  # ruta -> (estado padre, estado nodo, líneas DOT)
+        self._cached = (None, None)
+        self.paths = self._index(tree, ())
+
+    def _index(self, node, path):
+        """Indexa el subárbol de `node` y devuelve sus rutas en orden de recorrido (DFS)."""
+        paths = []
+        stack = [(node, path)]
+        while stack:
+            n, p = stack.pop()
+            paths.append(p)
+            self.nodes[p] = n
+            self.depth = max(self.depth, len(p) + 1)
+            children = n.get("children", [])
+            for i in range(len(children) - 1, -1, -1):
+                stack.append((children[i], p + (i,)))
+        return paths
+
+    @staticmethod
+    def label(node):
+        return node.get("node", "<sin etiqueta>")
+
+    def path_label(self, path):
+        """Etiqueta con sangría para listas de selección de nodos."""
+        return "  " * len(path) + "↳ " * bool(path) + self.label(self.nodes[path])
+
+    def graft(self, path, children):
+        """Injerta `children` bajo el nodo de `path` (in situ) y devuelve sus rutas."""
+        node = self.nodes[path]
+        siblings = node.setdefault("children", [])
+        start = len(siblings)
+        siblings.extend(children)
+        new_paths = []
+        for i, child in enumerate(children):
+            new_paths.extend(self._index(child, path + (start + i,)))
+        # Las rutas nuevas van tras el último descendiente del nodo, no al final del árbol
+        pos = self.paths.index(path) + 1
+        depth = len(path)
+        while pos < len(self.paths) and self.paths[pos][:depth] == path and len(self.paths[pos]) > depth:
+            pos += 1
+        self.paths[pos:pos] = new_paths
+        self._cached = (None, None)
+        return new_paths
+
+    def set_aliases(self, aliases):
+        """Estados leídos por etiqueta canónica: los duplicados entre marcos comparten estado."""
+        if aliases != self.aliases:
+            self.aliases = aliases
+            self._cached = (None, None)
+
+    def _state(self, node_states, path):
+        label = self.label(self.nodes[path])
+        return node_states.get(self.aliases.get(label, label), {}).get("state", "Abierta")
+
+    def dot(self, node_states):
+        signature = tuple(sorted((k, v.get("state")) for k, v in node_states.items()))
+        if self._cached[0] == signature:
+            return self._cached[1]
+        parts = []
+        for path in self.paths:
+            state = self._state(node_states, path)
+            parent_state = self._state(node_states, path[:-1]) if path else None
+            cached = self._lines.get(path)
+            if cached is None or cached[0] != parent_state or cached[1] != state:
+                label = f"{STATE_EMOJIS.get(state, '🟢')} {self.label(self.nodes[path])}"
+                lines = ""
+                if path:
+                    parent_label = f"{STATE_EMOJIS.get(parent_state, '🟢')} {self.label(self.nodes[path[:-1]])}"
+                    lines += f'"{parent_label}" -> "{label}";\n'
+                color = STATE_COLORS.get(state, "black")
+                lines += f'"{label}" [style=filled, fillcolor={color}, shape=box, fontname="Arial", fontsize=14];\n'
+                cached = (parent_state, state, lines)
+                self._lines[path] = cached
+            parts.append(cached[2])
+        dot = 'digraph G {\nrankdir=TB;\nnode [style=filled, fontname="Arial"];\n' + "".join(parts) + "}"
+        self._cached = (signature, dot)
+        return dot
@@ -0,0 +1,15 @@
+# modules/openai_client.py
+
+import os
+
+
+def get_openai():
+    """
+    Devuelve el módulo openai con la clave configurada. El SDK se importa en la
+    primera llamada real, no al arrancar la app ni con el backend falso.
+    """
+    import openai
+    if openai.api_key is None:
+        # Configura tu clave de OpenAI desde la variable de entorno
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+    return openai
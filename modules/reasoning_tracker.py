@@ -1,6 +1,8 @@
 import json
 from datetime import datetime
 
+from modules.tracing import traced
+
 class ReasoningTracker:
     def __init__(self, root_question):
         self.log = {
@@ -37,24 +39,31 @@ class ReasoningTracker:
             "parent_node": parent_node
         })
 
-    def add_feedback(self, node_or_step_id, comment, author="Anónimo", tipo="Humano"):
+    def add_feedback(self, node_or_step_id, comment, author="Anónimo", tipo="Humano", marco=None):
         if node_or_step_id not in self.log["feedback"]:
             self.log["feedback"][node_or_step_id] = []
-        self.log["feedback"][node_or_step_id].append({
+        entry = {
             "comment": comment,
             "author": author,
             "tipo": tipo,
+            "marco": marco,
             "timestamp": datetime.utcnow().isoformat()
-        })
+        }
+        self.log["feedback"][node_or_step_id].append(entry)
+        return entry
 
-    def set_node_state(self, node, state):
-        self.log["node_states"][node] = {
+    def set_node_state(self, node, state, marco=None):
+        entry = {
             "state": state,
+            "marco": marco,
             "timestamp": datetime.utcnow().isoformat()
         }
+        self.log["node_states"][node] = entry
+        return entry
 
     def _stamp(self, evt):
         self.log["times"].append({evt: datetime.utcnow().isoformat()})
 
+    @traced("reasoning_tracker.export")
     def export(self):
         return json.dumps(self.log, ensure_ascii=False, indent=2)
@@ -0,0 +1,237 @@
+# modules/session_memory.py
+"""
+Gestor de memoria de las sesiones abiertas.
+
+Los datos pesados de cada sesión (tracker, árboles, respuestas) viven en un
+SessionSlot en lugar de directamente en st.session_state. El gestor anota la
+huella estimada y la última actividad de cada slot y:
+
+- vuelca a disco (pickle comprimido con zlib) los slots inactivos;
+- si la memoria residente total supera el techo global, vuelca los menos
+  usados recientemente (LRU);
+- borra los volcados de sesiones abandonadas tras `retention_seconds`.
+
+Un slot volcado se rehidrata de forma perezosa en el primer acceso.
+"""
+
+import os
+import time
+import zlib
+import pickle
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from modules.tracing import traced
+
+
+class SessionSlot(MutableMapping):
+    """
+    Diccionario de datos pesados de una sesión que puede estar en memoria o en
+    disco. Las claves de `transient` son cachés derivables (p. ej. grafos DOT):
+    al volcar se descartan en lugar de guardarse.
+    """
+
+    def __init__(self, slot_id, path, transient=()):
+        self.slot_id = slot_id
+        self.path = path
+        self.transient = set(transient)
+        self.data = {}
+        self.spilled = False
+        self.footprint = 0
+        self.last_activity = time.time()
+        self.running = False   # ejecución del script en curso (checkin .. checkout)
+        self.holds = 0         # bloques hold() abiertos
+        self._lock = threading.RLock()
+
+    # ---- Interfaz de diccionario (rehidrata si hace falta) ----
+    def __getitem__(self, key):
+        with self._lock:
+            self._ensure_loaded()
+            return self.data[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._ensure_loaded()
+            self.data[key] = value
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._ensure_loaded()
+            del self.data[key]
+
+    def __iter__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return iter(list(self.data))
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self.data)
+
+    @contextmanager
+    def hold(self):
+        """Impide el volcado mientras dura el bloque (p. ej. un fragmento que se refresca solo)."""
+        with self._lock:
+            self.holds += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self.holds -= 1
+
+    def _persistent(self):
+        return {k: v for k, v in self.data.items() if k not in self.transient}
+
+    def measure(self):
+        """Huella estimada en bytes (tamaño del pickle de los datos persistentes)."""
+        with self._lock:
+            if not self.spilled:
+                self.footprint = len(pickle.dumps(self._persistent(), protocol=pickle.HIGHEST_PROTOCOL))
+            return self.footprint
+
+    @traced("session_memory.spill")
+    def spill(self, stale_after=None):
+        """
+        Vuelca los datos a disco y los libera de memoria. Devuelve los bytes liberados.
+        No toca un slot con una ejecución en curso, salvo que lleve más de
+        `stale_after` segundos sin actividad (ejecución interrumpida sin checkout).
+        """
+        with self._lock:
+            if self.spilled or self.holds:
+                return 0
+            if self.running:
+                if stale_after is None or time.time() - self.last_activity < stale_after:
+                    return 0
+                self.running = False
+            raw = pickle.dumps(self._persistent(), protocol=pickle.HIGHEST_PROTOCOL)
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(raw, 6))
+            os.replace(tmp, self.path)
+            freed = self.footprint or len(raw)
+            self.data = {}
+            self.spilled = True
+            self.footprint = 0
+            return freed
+
+    def _ensure_loaded(self):
+        if self.spilled:
+            self._rehydrate()
+
+    @traced("session_memory.rehydrate")
+    def _rehydrate(self):
+        try:
+            with open(self.path, "rb") as f:
+                self.data = pickle.loads(zlib.decompress(f.read()))
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError):
+            # Volcado perdido o dañado: la sesión empieza de cero
+            self.data = {}
+        self.spilled = False
+        self.discard_file()
+        self.measure()
+
+    def discard_file(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class SessionMemoryManager:
+    """
+    Registro LRU de slots con techo global de memoria (`max_bytes`) y volcado de
+    sesiones inactivas más de `idle_seconds`.
+    """
+
+    def __init__(self, directory="session_spill", max_bytes=512 * 1024 * 1024, idle_seconds=900,
+                 retention_seconds=24 * 3600, transient=()):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.retention_seconds = retention_seconds
+        self.transient = tuple(transient)
+        self.slots = OrderedDict()  # slot_id -> SessionSlot, del menos al más reciente
+        self.spills = 0
+        self.forget_listeners = []  # fn(slot_id) al olvidar un slot
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, transient=()):
+        return cls(
+            directory=os.getenv("CODIGO_SPILL_DIR", "session_spill"),
+            max_bytes=int(float(os.getenv("CODIGO_MEMORIA_MB", "512")) * 1024 * 1024),
+            idle_seconds=float(os.getenv("CODIGO_SESION_INACTIVA_S", "900")),
+            transient=transient,
+        )
+
+    def checkin(self, slot_id):
+        """Slot de la sesión al empezar una ejecución del script (lo marca como activo)."""
+        with self._lock:
+            slot = self.slots.get(slot_id)
+            if slot is None:
+                path = os.path.join(self.directory, f"{slot_id}.pkl.z")
+                slot = self.slots[slot_id] = SessionSlot(slot_id, path, self.transient)
+            self.slots.move_to_end(slot_id)
+        # Bajo el lock del slot: un spill() en curso termina antes, y ninguno empieza
+        # después mientras la ejecución lee sus datos
+        with slot._lock:
+            slot.last_activity = time.time()
+            slot.running = True
+        return slot
+
+    def checkout(self, slot):
+        """Fin de la ejecución: actualiza la huella y aplica inactividad y techo global."""
+        with slot._lock:
+            slot.last_activity = time.time()
+            slot.running = False
+        slot.measure()
+        self.enforce(keep=slot.slot_id)
+
+    @traced("session_memory.enforce")
+    def enforce(self, keep=None, now=None):
+        """Vuelca inactivos y, si hace falta, los menos recientes hasta bajar del techo."""
+        now = now or time.time()
+        with self._lock:
+            slots = list(self.slots.values())
+        for slot in slots:
+            idle = now - slot.last_activity
+            if slot.spilled and idle > self.retention_seconds:
+                self.forget(slot.slot_id)
+            elif slot.slot_id != keep and not slot.spilled and idle > self.idle_seconds:
+                self.spills += bool(slot.spill(stale_after=self.idle_seconds))
+        resident = self.resident_bytes()
+        for slot in slots:
+            if resident <= self.max_bytes:
+                break
+            if slot.slot_id == keep or slot.spilled:
+                continue
+            # spill() comprueba `running` bajo el lock del slot
+            freed = slot.spill(stale_after=self.idle_seconds)
+            resident -= freed
+            self.spills += bool(freed)
+
+    def forget(self, slot_id):
+        """Elimina el slot y su volcado (reset o sesión abandonada)."""
+        with self._lock:
+            slot = self.slots.pop(slot_id, None)
+        if slot is not None:
+            slot.discard_file()
+        for listener in list(self.forget_listeners):
+            listener(slot_id)
+
+    def resident_bytes(self):
+        return sum(s.footprint for s in list(self.slots.values()) if not s.spilled)
+
+    def summary(self):
+        slots = list(self.slots.values())
+        return {
+            "sesiones_en_memoria": sum(1 for s in slots if not s.spilled),
+            "sesiones_en_disco": sum(1 for s in slots if s.spilled),
+            "mb_residentes": round(self.resident_bytes() / (1024 * 1024), 2),
+            "mb_limite": round(self.max_bytes / (1024 * 1024), 2),
+            "volcados": self.spills,
+        }
@@ -0,0 +1,164 @@
+# modules/speculative.py
+
+import threading
+import contextvars
+
+from modules.multiperspective import generar_respuestas_multiperspectiva
+from modules.token_budget import count_tokens
+from modules.tracing import current_span
+
+# Estimación conservadora de una llamada de respuestas multiperspectiva (prompt + max_tokens)
+RESPONSE_CALL_ESTIMATE = 950
+
+
+def response_key(nodo, marco):
+    """Clave de caché tolerante a mayúsculas y espacios en la subpregunta escrita."""
+    return " ".join(str(nodo).split()).casefold(), marco
+
+
+class SpeculativePrefetcher:
+    """
+    Precarga en segundo plano las respuestas multiperspectiva de los K primeros
+    hijos del árbol elegido, para que el clic en «Obtener respuestas» sea inmediato.
+
+    - token_limit acota los tokens que puede gastar la especulación en la sesión.
+    - cancel() descarta lo pendiente; lo que ya está en curso no se guarda.
+    - canonical traduce cada subpregunta a su nodo canónico (modules/dedup.py),
+      para que la precarga de un duplicado sirva al nodo unificado que se consulta.
+    - drain() entrega lo ya precargado para guardarlo en el slot de la sesión
+      (modules/session_memory.py); get() lo busca en ese `store`.
+    """
+
+    def __init__(self, executor, chat_fn, token_limit=3000, top_k=3, canonical=None):
+        self.executor = executor
+        self.chat_fn = chat_fn
+        self.canonical = canonical
+        self.token_limit = token_limit
+        self.top_k = top_k
+        self.cache = {}      # terminadas y aún no entregadas con drain()
+        self.drained = set()
+        self.futures = {}
+        self.spent = 0
+        self.reserved = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def _key(self, nodo, marco):
+        return response_key(self.canonical(nodo) if self.canonical else nodo, marco)
+
+    def _counting_chat(self, messages, max_tokens=500):
+        resp = self.chat_fn(messages, max_tokens=max_tokens)
+        usage = getattr(resp, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None) is not None:
+            used = usage.total_tokens
+        else:
+            used = sum(count_tokens(m.get("content", "")) for m in messages) + count_tokens(
+                resp.choices[0].message.content or ""
+            )
+        with self._lock:
+            self.spent += used
+        return resp
+
+    def _run(self, key, nodo, marco):
+        try:
+            if self._cancelled.is_set():
+                return None
+            data = generar_respuestas_multiperspectiva(nodo, marco, self._counting_chat)
+            if data and not self._cancelled.is_set():
+                with self._lock:
+                    self.cache[key] = data
+            return data
+        finally:
+            with self._lock:
+                self.reserved -= RESPONSE_CALL_ESTIMATE
+
+    def schedule(self, tree, marco):
+        """Lanza la precarga de los primeros top_k hijos de `tree` dentro del presupuesto."""
+        if self._cancelled.is_set():
+            return 0
+        self._drop_finished()
+        launched = 0
+        for child in (tree or {}).get("children", [])[: self.top_k]:
+            nodo = child.get("node")
+            if not nodo:
+                continue
+            key = self._key(nodo, marco)
+            with self._lock:
+                if key in self.cache or key in self.drained or key in self.futures:
+                    continue
+                if self.spent + self.reserved + RESPONSE_CALL_ESTIMATE > self.token_limit:
+                    break
+                self.reserved += RESPONSE_CALL_ESTIMATE
+            self.futures[key] = self.executor.submit(
+                contextvars.copy_context().run, self._run, key, nodo, marco
+            )
+            launched += 1
+        return launched
+
+    def drain(self):
+        """{clave: respuestas} terminadas desde la última llamada; dejan de guardarse aquí."""
+        with self._lock:
+            done, self.cache = self.cache, {}
+            self.drained.update(done)
+        for key in done:
+            self.futures.pop(key, None)
+        return done
+
+    def get(self, nodo, marco, store=None):
+        """
+        Respuestas precargadas para (nodo, marco), buscando primero en `store` (lo
+        entregado por drain()) y esperando solo si la precarga ya se está
+        ejecutando; None si no se especuló sobre ese nodo, falló o seguía en cola
+        (entonces se cancela y quien llama genera la respuesta directamente).
+        """
+        key = self._key(nodo, marco)
+        with self._lock:
+            data = (store or {}).get(key) or self.cache.get(key)
+        future = self.futures.get(key)
+        if data is None and future is not None and not future.done() and not future.running():
+            if future.cancel():
+                # El pool es compartido entre sesiones: no se espera detrás de otras precargas
+                with self._lock:
+                    self.reserved -= RESPONSE_CALL_ESTIMATE
+                self.futures.pop(key, None)
+                return None
+        if data is None and future is not None and not future.cancelled():
+            try:
+                data = future.result()
+            except Exception:
+                data = None
+        if data:
+            self.hits += 1
+            current_span().add(cache_hits=1)
+        return data
+
+    def cancel(self):
+        self._cancelled.set()
+        for future in self.futures.values():
+            if not future.cancelled() and future.cancel():
+                # No llegó a ejecutarse: se libera su reserva de tokens
+                with self._lock:
+                    self.reserved -= RESPONSE_CALL_ESTIMATE
+
+    def _drop_finished(self):
+        """
+        Olvida las tareas terminadas sin respuesta guardada (canceladas, aplazadas
+        con CallDeferred, fallidas o vacías) para que schedule() pueda relanzarlas.
+        """
+        with self._lock:
+            keep = set(self.cache) | self.drained
+        self.futures = {k: f for k, f in self.futures.items() if not f.done() or k in keep}
+
+    def resume(self):
+        self._cancelled.clear()
+        self._drop_finished()
+
+    def summary(self):
+        return {
+            "precargadas": len(self.cache) + len(self.drained),
+            "en_curso": sum(1 for f in self.futures.values() if not f.done()),
+            "aciertos": self.hits,
+            "tokens_especulativos": self.spent,
+            "limite_tokens": self.token_limit,
+        }
@@ -0,0 +1,92 @@
+# modules/step_index.py
+"""
+Índice incremental sobre los pasos del ReasoningTracker (`log["steps"]`) para
+las vistas paginadas: historial en la app y tabla de pasos del informe HTML.
+"""
+
+import json
+import math
+
+# Campo del filtro -> clave del paso
+FIELDS = {"event_type": "event_type", "marco": "marco", "node": "parent_node"}
+
+
+def content_summary(content, limit=400):
+    """Texto corto del contenido de un paso (como en la tabla del informe)."""
+    if isinstance(content, dict):
+        content = json.dumps(content, ensure_ascii=False)
+    elif isinstance(content, list):
+        content = "; ".join(str(x) for x in content)
+    content = "" if content is None else str(content)
+    return content[:limit] + ("..." if len(content) > limit else "")
+
+
+def step_row(step, position=None, limit=400):
+    """Fila resumida de un paso para tablas."""
+    row = {} if position is None else {"n": position}
+    row.update({
+        "momento": step.get("timestamp", ""),
+        "tipo": step.get("event_type", ""),
+        "contenido": content_summary(step.get("content", ""), limit),
+        "marco": step.get("marco") or "",
+        "nodo": step.get("parent_node") or "",
+    })
+    return row
+
+
+def page_count(total, page_size):
+    return max(1, math.ceil(total / page_size))
+
+
+def paginate(items, page, page_size):
+    """(porción visible, número de páginas) con `page` empezando en 1 y acotada."""
+    pages = page_count(len(items), page_size)
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], pages
+
+
+class StepIndex:
+    """
+    Posiciones de los pasos por tipo de evento, marco y nodo. La lista de pasos
+    solo crece, así que update() indexa únicamente los añadidos desde la última vez.
+    """
+
+    def __init__(self):
+        self.steps = None
+        self.size = 0
+        self.by = {field: {} for field in FIELDS}
+
+    def update(self, steps):
+        if steps is not self.steps:
+            # Otro tracker (nueva pregunta o sesión rehidratada): se reindexa
+            self.__init__()
+            self.steps = steps
+        for i in range(self.size, len(steps)):
+            for field, key in FIELDS.items():
+                self.by[field].setdefault(steps[i].get(key) or "", []).append(i)
+        self.size = len(steps)
+        return self
+
+    def values(self, field):
+        return sorted(v for v in self.by[field] if v)
+
+    def query(self, event_type=None, marco=None, node_contains=None):
+        """Posiciones (en orden) de los pasos que cumplen todos los filtros dados."""
+        candidates = []
+        if event_type:
+            candidates.append(self.by["event_type"].get(event_type, []))
+        if marco:
+            candidates.append(self.by["marco"].get(marco, []))
+        if node_contains:
+            needle = node_contains.casefold()
+            matching = [pos for node, pos in self.by["node"].items() if node and needle in node.casefold()]
+            candidates.append(sorted(p for pos in matching for p in pos))
+        if not candidates:
+            return list(range(self.size))
+        candidates.sort(key=len)
+        result = candidates[0]
+        for other in candidates[1:]:
+            keep = set(other)
+            result = [p for p in result if p in keep]
+        return result
@@ -0,0 +1,288 @@
+# modules/token_budget.py
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import closing
+from collections import deque
+from datetime import datetime
+
+HIGH = "alta"
+LOW = "baja"
+
+_encoders = {}
+
+
+class BudgetExceeded(RuntimeError):
+    """No queda presupuesto de tokens (sesión o día) para la llamada."""
+
+
+class CallDeferred(BudgetExceeded):
+    """Llamada de baja prioridad aplazada por falta de margen de presupuesto o de rate limit."""
+
+
+def _encoder(model):
+    # tiktoken está en requirements.txt; si falta se usa una aproximación de ~4 caracteres por token
+    if model not in _encoders:
+        try:
+            import tiktoken
+            try:
+                _encoders[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoders[model] = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoders[model] = None
+        except Exception:
+            # La primera vez descarga la tabla BPE: sin red se usa la aproximación
+            _encoders[model] = None
+    return _encoders[model]
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    enc = _encoder(model)
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text))
+
+
+def count_message_tokens(messages, model="gpt-3.5-turbo"):
+    """Tokens de prompt de una lista de mensajes de chat (formato de OpenAI)."""
+    return 3 + sum(4 + count_tokens(m.get("content", ""), model) for m in messages)
+
+
+class RateWindow:
+    """
+    Ventana deslizante de 60 s de peticiones y tokens. El límite de la API es por
+    clave, así que todas las sesiones del proceso comparten la misma ventana.
+    """
+
+    def __init__(self):
+        self.events = deque()  # (instante, tokens)
+        self._lock = threading.Lock()
+
+    def usage(self, now):
+        with self._lock:
+            while self.events and now - self.events[0][0] > 60:
+                self.events.popleft()
+            return len(self.events), sum(t for _, t in self.events)
+
+    def record(self, now, tokens):
+        with self._lock:
+            self.events.append((now, tokens))
+
+    def wait_time(self, now, rpm, tpm, tokens):
+        """Segundos hasta que la ventana admita una petición más de `tokens` (0 si ya cabe)."""
+        with self._lock:
+            while self.events and now - self.events[0][0] > 60:
+                self.events.popleft()
+            requests, used = len(self.events), sum(t for _, t in self.events)
+            wait = 0.0
+            for instant, spent in self.events:
+                if requests + 1 <= rpm and used + tokens <= tpm:
+                    break
+                requests -= 1
+                used -= spent
+                wait = instant + 60 - now + 0.01
+            return max(0.0, wait)
+
+
+_rate_window = RateWindow()
+
+
+def trim_tree(tree, max_tokens, model="gpt-3.5-turbo"):
+    """
+    Devuelve una copia del árbol recortada por niveles (en anchura) para que su
+    JSON no supere max_tokens. Se conservan siempre la raíz y los niveles superiores.
+    """
+    if not tree or not isinstance(tree, dict):
+        return tree
+    root = {"node": tree.get("node", ""), "children": []}
+    used = count_tokens(json.dumps(root, ensure_ascii=False), model)
+    queue = deque([(tree, root)])
+    while queue:
+        src, dst = queue.popleft()
+        for child in src.get("children", []):
+            copy = {"node": child.get("node", ""), "children": []}
+            cost = count_tokens(json.dumps(copy, ensure_ascii=False), model) + 1
+            if used + cost > max_tokens:
+                return root
+            used += cost
+            dst["children"].append(copy)
+            queue.append((child, copy))
+    return root
+
+
+class TokenBudget:
+    """
+    Contabilidad de tokens por sesión y por día/institución, con límites de
+    ritmo (peticiones y tokens por minuto). El consumo diario se guarda en la
+    base SQLite `path`, compartida por todas las sesiones y procesos del
+    servidor; los incrementos son atómicos (UPSERT), sin reescribir el fichero.
+
+    El rate limit no agota el presupuesto: las llamadas de prioridad alta esperan
+    a que la ventana se libere (como mucho `max_rate_wait` s, después se lanzan y
+    decide la API); solo las de prioridad baja se aplazan.
+    """
+
+    def __init__(self, session_limit=20000, daily_limit=500000, institution="default",
+                 path="token_usage.db", rpm=60, tpm=40000, low_priority_headroom=0.5,
+                 model="gpt-3.5-turbo", clock=time.time, window=None, max_rate_wait=20,
+                 sleep=time.sleep):
+        self.session_limit = session_limit
+        self.daily_limit = daily_limit
+        self.institution = institution
+        self.path = path
+        self.rpm = rpm
+        self.tpm = tpm
+        self.low_priority_headroom = low_priority_headroom
+        self.model = model
+        self.clock = clock
+        self.max_rate_wait = max_rate_wait
+        self.sleep = sleep
+        self.session = {"prompt": 0, "completion": 0, "calls": 0, "deferred": 0}
+        # Las precargas en segundo plano también cargan consumo a la sesión
+        self._lock = threading.Lock()
+        self.window = window or _rate_window
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                " day TEXT NOT NULL, institution TEXT NOT NULL,"
+                " prompt INTEGER NOT NULL DEFAULT 0, completion INTEGER NOT NULL DEFAULT 0,"
+                " calls INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (day, institution))"
+            )
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            session_limit=int(os.getenv("CODIGO_TOKENS_SESION", "20000")),
+            daily_limit=int(os.getenv("CODIGO_TOKENS_DIA", "500000")),
+            institution=os.getenv("CODIGO_INSTITUCION", "default"),
+            rpm=int(os.getenv("CODIGO_RPM", "60")),
+            tpm=int(os.getenv("CODIGO_TPM", "40000")),
+            max_rate_wait=float(os.getenv("CODIGO_RATE_ESPERA_S", "20")),
+        )
+
+    # ---- Libro diario compartido ----
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def load_ledger(self):
+        """{día: {institución: {prompt, completion, calls}}}"""
+        ledger = {}
+        with closing(self._connect()) as conn:
+            for day, institution, prompt, completion, calls in conn.execute(
+                "SELECT day, institution, prompt, completion, calls FROM usage"
+            ):
+                ledger.setdefault(day, {})[institution] = {
+                    "prompt": prompt, "completion": completion, "calls": calls
+                }
+        return ledger
+
+    def used_today(self):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT prompt + completion FROM usage WHERE day = ? AND institution = ?",
+                (datetime.utcnow().date().isoformat(), self.institution),
+            ).fetchone()
+        return row[0] if row else 0
+
+    def used_session(self):
+        with self._lock:
+            return self.session["prompt"] + self.session["completion"]
+
+    def remaining(self):
+        return max(0, min(self.session_limit - self.used_session(), self.daily_limit - self.used_today()))
+
+    # ---- Rate limit (ventana deslizante de 60 s compartida por el proceso) ----
+    def _window_usage(self):
+        return self.window.usage(self.clock())
+
+    def allows(self, tokens, priority=HIGH):
+        """
+        ¿Se puede lanzar una llamada estimada en `tokens` con esta prioridad? Las de
+        prioridad alta solo se comprueban contra el presupuesto de sesión y del día.
+        """
+        remaining = self.remaining()
+        if priority == LOW:
+            # Solo si sobra margen: reserva de presupuesto y de rate limit para lo prioritario
+            requests, window_tokens = self._window_usage()
+            reserve = self.low_priority_headroom
+            return (
+                tokens <= remaining * (1 - reserve)
+                and requests + 1 <= self.rpm * (1 - reserve)
+                and window_tokens + tokens <= self.tpm * (1 - reserve)
+            )
+        return tokens <= remaining
+
+    def wait_for_rate(self, tokens):
+        """Espera a que la ventana admita la llamada, como mucho `max_rate_wait` segundos."""
+        deadline = self.clock() + self.max_rate_wait
+        while True:
+            now = self.clock()
+            wait = self.window.wait_time(now, self.rpm, self.tpm, tokens)
+            if wait <= 0 or now >= deadline:
+                return
+            self.sleep(min(wait, deadline - now))
+
+    def charge(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.session["prompt"] += prompt_tokens
+            self.session["completion"] += completion_tokens
+            self.session["calls"] += 1
+        self.window.record(self.clock(), prompt_tokens + completion_tokens)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO usage (day, institution, prompt, completion, calls) VALUES (?, ?, ?, ?, 1)"
+                " ON CONFLICT (day, institution) DO UPDATE SET"
+                " prompt = prompt + excluded.prompt, completion = completion + excluded.completion,"
+                " calls = calls + 1",
+                (datetime.utcnow().date().isoformat(), self.institution, prompt_tokens, completion_tokens),
+            )
+
+    def defer(self):
+        with self._lock:
+            self.session["deferred"] += 1
+
+    def summary(self):
+        with self._lock:
+            session = dict(self.session)
+        return {
+            "tokens_sesion": session["prompt"] + session["completion"],
+            "limite_sesion": self.session_limit,
+            "tokens_hoy": self.used_today(),
+            "limite_dia": self.daily_limit,
+            "llamadas": session["calls"],
+            "aplazadas": session["deferred"],
+        }
+
+
+def budgeted_chat(chat_fn, budget, priority=HIGH):
+    """
+    Envuelve chat(messages, max_tokens): cuenta los tokens del prompt localmente,
+    ajusta max_tokens al presupuesto restante y registra el consumo real.
+    Lanza BudgetExceeded (o CallDeferred si la prioridad es baja) si no hay margen
+    de presupuesto; por rate limit solo se aplazan las de prioridad baja.
+    """
+    def wrapper(messages, max_tokens=500):
+        prompt_tokens = count_message_tokens(messages, budget.model)
+        if not budget.allows(prompt_tokens + max_tokens, priority):
+            if priority == LOW:
+                budget.defer()
+                raise CallDeferred("Llamada de baja prioridad aplazada por presupuesto o rate limit.")
+            # Las llamadas prioritarias se ajustan a lo que quede en lugar de fallar
+            max_tokens = min(max_tokens, budget.remaining() - prompt_tokens)
+            if max_tokens <= 0 or not budget.allows(prompt_tokens + max_tokens, priority):
+                raise BudgetExceeded("Presupuesto de tokens agotado para esta sesión o institución.")
+        if priority != LOW:
+            budget.wait_for_rate(prompt_tokens + max_tokens)
+        resp = chat_fn(messages, max_tokens=max_tokens)
+        usage = getattr(resp, "usage", None)
+        if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+            budget.charge(usage.prompt_tokens, usage.completion_tokens)
+        else:
+            content = resp.choices[0].message.content or ""
+            budget.charge(prompt_tokens, count_tokens(content, budget.model))
+        return resp
+    return wrapper
@@ -0,0 +1,218 @@
+# modules/tracing.py
+
+import json
+import time
+import functools
+import contextvars
+from collections import deque
+from datetime import datetime
+
+# Tracer activo en el hilo/contexto actual (None = trazas desactivadas)
+_active_tracer = contextvars.ContextVar("codigo_tracer", default=None)
+_current_span = contextvars.ContextVar("codigo_span", default=None)
+
+
+class _NullSpan:
+    """Span vacío que se devuelve cuando las trazas están desactivadas."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **counters):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        # counters: lo registrado en este span; totals: incluye los spans hijos
+        self.counters = {"tokens_in": 0, "tokens_out": 0, "cache_hits": 0, "retries": 0}
+        self.totals = dict(self.counters)
+        self.parent = None
+        self._token = None
+
+    def add(self, **counters):
+        """Suma contadores (tokens_in, tokens_out, cache_hits, retries) al span."""
+        for k, v in counters.items():
+            self.counters[k] = self.counters.get(k, 0) + (v or 0)
+            self.totals[k] = self.totals.get(k, 0) + (v or 0)
+
+    def _add_child(self, totals):
+        for k, v in totals.items():
+            self.totals[k] = self.totals.get(k, 0) + v
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self.started = datetime.utcnow().isoformat()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._t0
+        _current_span.reset(self._token)
+        if self.parent is not None:
+            # Solo en los totales del padre: los contadores propios no se duplican al exportar
+            self.parent._add_child(self.totals)
+        self.tracer.spans.append({
+            "run": self.tracer.run,
+            "name": self.name,
+            "parent": self.parent.name if self.parent is not None else None,
+            "timestamp": self.started,
+            "duration_ms": round(duration * 1000, 3),
+            "error": exc_type.__name__ if exc_type else None,
+            **self.counters,
+            "tokens_incl": self.totals["tokens_in"] + self.totals["tokens_out"],
+            "cache_hits_incl": self.totals["cache_hits"],
+            **self.attrs,
+        })
+        return False
+
+
+class Tracer:
+    """
+    Registro ligero de spans de tiempo por etapa. Cuando enabled=False,
+    span() devuelve NULL_SPAN y no se mide ni se guarda nada.
+    """
+
+    def __init__(self, enabled=False, max_spans=5000):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.run = 0
+
+    def new_run(self):
+        """Marca el inicio de una nueva ejecución del script de Streamlit."""
+        self.run += 1
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attrs)
+
+    def clear(self):
+        self.spans.clear()
+
+    def summary(self, run=None):
+        """
+        Agrega duración, tokens, aciertos de caché y reintentos por etapa. Los
+        contadores son los registrados por la propia etapa; `tokens_incl` y
+        `cache_hits_incl` incluyen además los de sus etapas anidadas.
+        """
+        agg = {}
+        for s in list(self.spans):
+            if run is not None and s["run"] != run:
+                continue
+            row = agg.setdefault(s["name"], {
+                "etapa": s["name"], "llamadas": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "tokens_in": 0, "tokens_out": 0, "cache_hits": 0, "retries": 0, "errores": 0,
+                "tokens_incl": 0, "cache_hits_incl": 0,
+            })
+            row["llamadas"] += 1
+            row["total_ms"] = round(row["total_ms"] + s["duration_ms"], 3)
+            row["max_ms"] = max(row["max_ms"], s["duration_ms"])
+            for k in ("tokens_in", "tokens_out", "cache_hits", "retries", "tokens_incl", "cache_hits_incl"):
+                row[k] += s.get(k, 0)
+            row["errores"] += 1 if s.get("error") else 0
+        return sorted(agg.values(), key=lambda r: r["total_ms"], reverse=True)
+
+    def to_jsonl(self):
+        return "".join(json.dumps(s, ensure_ascii=False) + "\n" for s in list(self.spans))
+
+    def to_prometheus(self, prefix="codigo_deliberativo"):
+        """
+        Exporta los agregados en formato de texto de Prometheus. Tokens y aciertos
+        de caché salen solo de la etapa que los registró, así que sumar una serie
+        entre etapas da el total real.
+        """
+        rows = self.summary()
+        families = [
+            ("stage_duration_seconds", "summary", [
+                ("_sum", "", lambda r: f"{r['total_ms'] / 1000:.6f}"),
+                ("_count", "", lambda r: r["llamadas"]),
+            ]),
+            ("llm_tokens_total", "counter", [
+                ("", ',direction="in"', lambda r: r["tokens_in"]),
+                ("", ',direction="out"', lambda r: r["tokens_out"]),
+            ]),
+            ("cache_hits_total", "counter", [("", "", lambda r: r["cache_hits"])]),
+            ("llm_retries_total", "counter", [("", "", lambda r: r["retries"])]),
+            ("stage_errors_total", "counter", [("", "", lambda r: r["errores"])]),
+        ]
+        lines = []
+        for name, kind, samples in families:
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for row in rows:
+                label = row["etapa"].replace("\\", "\\\\").replace('"', '\\"')
+                for suffix, extra, value in samples:
+                    lines.append(f'{prefix}_{name}{suffix}{{stage="{label}"{extra}}} {value(row)}')
+        return "\n".join(lines) + "\n"
+
+
+def activate(tracer):
+    """Fija el tracer usado por span()/traced() en el contexto actual."""
+    _active_tracer.set(tracer)
+
+
+def get_tracer():
+    return _active_tracer.get()
+
+
+def span(name, **attrs):
+    tracer = _active_tracer.get()
+    if tracer is None or not tracer.enabled:
+        return NULL_SPAN
+    return Span(tracer, name, attrs)
+
+
+def current_span():
+    """Span abierto en el contexto actual, o NULL_SPAN si no hay ninguno."""
+    return _current_span.get() or NULL_SPAN
+
+
+def traced(name):
+    """Decorador: envuelve la función en un span si hay un tracer activo."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _active_tracer.get()
+            if tracer is None or not tracer.enabled:
+                return fn(*args, **kwargs)
+            with Span(tracer, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_chat(chat_fn, retries=0):
+    """
+    Envuelve una función chat(messages, max_tokens) para registrar un span
+    'llm.chat' con tokens de entrada/salida (resp.usage) y reintentos.
+    """
+    def wrapper(messages, max_tokens=500):
+        with span("llm.chat", max_tokens=max_tokens) as s:
+            attempt = 0
+            while True:
+                try:
+                    resp = chat_fn(messages, max_tokens=max_tokens)
+                    break
+                except Exception:
+                    if attempt >= retries:
+                        raise
+                    attempt += 1
+                    s.add(retries=1)
+            usage = getattr(resp, "usage", None)
+            if usage is not None:
+                s.add(
+                    tokens_in=getattr(usage, "prompt_tokens", 0),
+                    tokens_out=getattr(usage, "completion_tokens", 0),
+                )
+            return resp
+    return wrapper
@@ -1,11 +1,14 @@
 import json
 from datetime import datetime
 
+from modules.tracing import traced
+
 class UsageMetrics:
     def __init__(self, path="usage_metrics.json"):
         self.path = path
         self.metrics = self.load_metrics()
 
+    @traced("usage_metrics.load")
     def load_metrics(self):
         try:
             with open(self.path, "r") as f:
@@ -26,6 +29,7 @@ class UsageMetrics:
         self.metrics["total_nodes"] += n
         self.save()
 
+    @traced("usage_metrics.save")
     def save(self):
         with open(self.path, "w") as f:
             json.dump(self.metrics, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,12 @@
+# tests/test_columnar_export.py
+
+from modules.columnar_export import rows_since
+from modules.reasoning_tracker import ReasoningTracker
+
+
+def test_feedback_and_state_rows_carry_the_frame():
+    tracker = ReasoningTracker("¿Es ético X?")
+    tracker.add_feedback("nodo", "hola", marco="Ética")
+    tracker.set_node_state("nodo", "En disputa", marco="Epistemológica")
+    rows, _ = rows_since(tracker.log, "s1")
+    assert {(r["kind"], r["marco"]) for r in rows} == {("feedback", "Ética"), ("state", "Epistemológica")}
@@ -0,0 +1,46 @@
+# tests/test_dedup.py
+
+from modules.dedup import merge_trees, normalize, similarity
+
+
+def _trees(a, b):
+    return {
+        "Ética": {"node": "Raíz", "children": [{"node": a, "children": []}]},
+        "Epistemológica": {"node": "Raíz", "children": [{"node": b, "children": []}]},
+    }
+
+
+def _merged(a, b):
+    return merge_trees(_trees(a, b)).canonical_label(b) == a
+
+
+def test_opposite_pairs_are_not_merged():
+    pairs = [
+        ("¿Cuáles son las ventajas de la IA en diagnósticos?", "¿Cuáles son las desventajas de la IA en diagnósticos?"),
+        ("¿Es ético usar IA en diagnósticos médicos?", "¿No es ético usar IA en diagnósticos médicos?"),
+        ("¿Es legal el uso de datos clínicos?", "¿Es ilegal el uso de datos clínicos?"),
+    ]
+    for a, b in pairs:
+        assert similarity(normalize(a), normalize(b)) == 0.0
+        assert not _merged(a, b)
+
+
+def test_near_duplicates_are_merged():
+    assert _merged("1. ¿Quién es responsable de los errores?", "¿Quién es responsable de los errores")
+    assert _merged("¿Es ético X?", "¿Es etico X?")
+
+
+def test_different_numbers_are_not_merged():
+    assert not _merged("¿Qué cambió en 1990?", "¿Qué cambió en 2000?")
+
+
+def test_pinned_canonical_survives_new_trees():
+    a = "¿Qué riesgos tiene la IA en la educación?"
+    b = "¿Qué riesgos tiene la IA en educación?"
+    pinned = {b: b}
+    graph = merge_trees(_trees(a, b), pinned=pinned)
+    assert graph.canonical_label(a) == b
+    assert graph.report()["nodos_canonicos"] == 2
+    # Un marco nuevo insertado delante no cambia la canónica fijada
+    trees = {"Crítica": {"node": a, "children": []}, **_trees(a, b)}
+    assert merge_trees(trees, pinned=pinned).canonical_label(a) == b
@@ -0,0 +1,41 @@
+# tests/test_live_sync.py
+
+from modules.live_sync import (
+    FeedbackChannel, LiveSync, _timestamp, merged_feedback, merged_states, new_remote, room_for,
+)
+from modules.reasoning_tracker import ReasoningTracker
+
+
+def test_no_room_without_code():
+    assert room_for("", "¿Es ético X?") is None
+    assert room_for("1ºB", "¿Es ético X?") != room_for("1ºA", "¿Es ético X?")
+
+
+def test_remote_events_stay_out_of_tracker(tmp_path):
+    channel = FeedbackChannel(str(tmp_path / "s.db"))
+    room = room_for("clase", "¿Es ético X?")
+    a, b = LiveSync(channel, room, "a"), LiveSync(channel, room, "b")
+    tracker_a, tracker_b = ReasoningTracker("¿Es ético X?"), ReasoningTracker("¿Es ético X?")
+    a.publish_feedback("nodo", tracker_a.add_feedback("nodo", "hola"))
+    a.publish_state("nodo", tracker_a.set_node_state("nodo", "Resuelta"))
+    remote = new_remote()
+    assert b.apply(remote) == {"nodo"}
+    assert tracker_b.log["feedback"] == {} and tracker_b.log["node_states"] == {}
+    assert merged_states(tracker_b.log["node_states"], remote)["nodo"]["state"] == "Resuelta"
+    assert [e["comment"] for e in merged_feedback(tracker_b.log["feedback"], remote, "nodo")] == ["hola"]
+
+
+def test_history_and_retention_are_bounded(tmp_path):
+    channel = FeedbackChannel(str(tmp_path / "s.db"), retention_seconds=3600)
+    room = room_for("clase", "¿Es ético X?")
+    with channel._conn:
+        channel._conn.execute(
+            "INSERT INTO events (room, kind, node, payload, origin, created) VALUES (?, 'feedback', 'n', '{}', 'x', ?)",
+            (room, _timestamp(1800)),
+        )
+    # Un suscriptor nuevo no repasa lo anterior a su ventana de historia
+    assert LiveSync(channel, room, "late", history_seconds=600).apply(new_remote()) == set()
+    assert LiveSync(channel, room, "early", history_seconds=3600).apply(new_remote()) == {"n"}
+    channel.retention_seconds = 600
+    assert channel.prune() == 1
+    assert channel.poll(room) == []
@@ -0,0 +1,22 @@
+# tests/test_multiperspective.py
+
+import copy
+
+from modules.multiperspective import TreeGraph
+
+
+def _tree():
+    return {"node": "R", "children": [
+        {"node": "A", "children": [{"node": "A1", "children": []}]},
+        {"node": "B", "children": []},
+    ]}
+
+
+def test_graft_keeps_paths_in_dfs_order():
+    graph = TreeGraph(_tree())
+    graph.graft((0,), [{"node": "A2", "children": [{"node": "A2a", "children": []}]}])
+    graph.graft((1,), [{"node": "B1", "children": []}])
+    fresh = TreeGraph(copy.deepcopy(graph.tree))
+    assert graph.paths == fresh.paths
+    assert [graph.label(graph.nodes[p]) for p in graph.paths] == ["R", "A", "A1", "A2", "A2a", "B", "B1"]
+    assert graph.depth == fresh.depth == 4
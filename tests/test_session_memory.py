@@ -0,0 +1,35 @@
+# tests/test_session_memory.py
+
+import time
+
+from modules.session_memory import SessionMemoryManager
+
+
+def _manager(tmp_path, **kwargs):
+    return SessionMemoryManager(directory=str(tmp_path), max_bytes=1, idle_seconds=60, **kwargs)
+
+
+def test_running_slot_is_not_spilled(tmp_path):
+    memory = _manager(tmp_path)
+    busy = memory.checkin("busy")
+    busy["tracker"] = "x" * 1000
+    busy.measure()
+    other = memory.checkin("other")
+    other["tracker"] = "y" * 1000
+    memory.checkout(other)
+    # Techo superado, pero la ejecución de `busy` sigue en curso
+    assert not busy.spilled and busy.running
+    memory.checkout(busy)
+    memory.enforce(keep="other")
+    assert busy.spilled and not busy.running
+
+
+def test_interrupted_run_does_not_pin_slot_forever(tmp_path):
+    memory = _manager(tmp_path)
+    slot = memory.checkin("stopped")
+    slot["tracker"] = "x" * 1000
+    slot.measure()
+    # Ejecución cortada sin checkout (st.stop, excepción): el flag queda activo
+    slot.last_activity = time.time() - 120
+    memory.enforce()
+    assert slot.spilled and not slot.running
@@ -0,0 +1,36 @@
+# tests/test_speculative.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.speculative import SpeculativePrefetcher
+from modules.token_budget import CallDeferred
+
+
+class _Resp:
+    usage = None
+
+    class _Choice:
+        class message:
+            content = '[{"label": "Ética", "text": "ok"}]'
+
+    choices = [_Choice]
+
+
+def test_failed_prefetch_is_rescheduled():
+    calls = []
+
+    def chat(messages, max_tokens=500):
+        calls.append(1)
+        if len(calls) == 1:
+            raise CallDeferred("sin margen")
+        return _Resp()
+
+    tree = {"node": "raíz", "children": [{"node": "¿Es ético X?", "children": []}]}
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prefetcher = SpeculativePrefetcher(executor, chat, top_k=1)
+        assert prefetcher.schedule(tree, "Ética") == 1
+        next(iter(prefetcher.futures.values())).exception()
+        prefetcher.resume()
+        assert prefetcher.schedule(tree, "Ética") == 1
+        next(iter(prefetcher.futures.values())).result()
+        assert prefetcher.get("¿Es ético X?", "Ética") == [{"label": "Ética", "text": "ok"}]
@@ -0,0 +1,53 @@
+# tests/test_token_budget.py
+
+import pytest
+
+from modules.token_budget import LOW, BudgetExceeded, CallDeferred, RateWindow, TokenBudget, budgeted_chat
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class _Resp:
+    usage = None
+
+    class _Choice:
+        class message:
+            content = "ok"
+
+    choices = [_Choice]
+
+
+def _chat(messages, max_tokens=500):
+    return _Resp()
+
+
+def _budget(tmp_path, clock, window, **kwargs):
+    return TokenBudget(path=str(tmp_path / "u.db"), rpm=60, clock=clock, window=window,
+                       sleep=clock.sleep, **kwargs)
+
+
+def test_rate_window_delays_high_priority_instead_of_failing(tmp_path):
+    clock, window = _Clock(), RateWindow()
+    messages = [{"role": "user", "content": "hola"}]
+    for _ in range(61):
+        # Un presupuesto por sesión, con la ventana compartida por el proceso
+        budgeted_chat(_chat, _budget(tmp_path, clock, window))(messages, max_tokens=50)
+    assert clock.now > 1000.0
+    with pytest.raises(CallDeferred):
+        budgeted_chat(_chat, _budget(tmp_path, clock, window), priority=LOW)(messages, max_tokens=50)
+
+
+def test_exhausted_budget_still_fails(tmp_path):
+    clock = _Clock()
+    budget = _budget(tmp_path, clock, RateWindow(), session_limit=10)
+    with pytest.raises(BudgetExceeded):
+        budgeted_chat(_chat, budget)([{"role": "user", "content": "x" * 100}], max_tokens=50)